@@ -0,0 +1,61 @@
+"""Synthetic hospital datasets for the benchmarks.
+
+Files are generated once per (rows, format, generation) and cached on disk,
+since large Excel files take a while to write.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+SERVICE_TYPES = ['Hospital care (acute services)', 'Hospital care (continuing care services)',
+                 'Surgical services', 'Medical services', 'Maternity services', 'Mental health services']
+REGIONS = ['Auckland', 'Waikato', 'Canterbury', 'Southern', 'Capital and Coast', 'Northland',
+           'New South Wales', 'Victoria', 'Queensland', 'Western Australia']
+
+# Share of rows whose bed count changes in generation 2, and rows it adds
+CHANGED_FRACTION = 0.01
+ADDED_ROWS_FRACTION = 0.001
+
+
+def make_dataset(rows: int, generation: int = 1, seed: int = 42) -> pd.DataFrame:
+    """Build a provider-like table of ``rows`` rows.
+
+    Generation 2 is generation 1 with some bed counts changed and a few rows
+    added, so a run against it exercises the compare, changelog and write paths.
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.arange(rows)
+    df = pd.DataFrame({
+        'Premises name': [f"Hospital {i:07d}" for i in ids],
+        'Service types': rng.choice(SERVICE_TYPES, rows),
+        'Region': rng.choice(REGIONS, rows),
+        'Address': [f"{i % 997 + 1} Example Street, Suburb {i % 211}" for i in ids],
+        'Beds': rng.integers(5, 900, rows),
+        'Certification expiry': pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 1460, rows), unit='D'),
+        'Occupancy rate': rng.random(rows).round(4),
+    })
+    df['Certification expiry'] = df['Certification expiry'].dt.strftime('%Y-%m-%d')
+
+    if generation > 1:
+        changed = rng.choice(rows, max(1, int(rows * CHANGED_FRACTION)), replace=False)
+        df.loc[changed, 'Beds'] += 1
+        added = make_dataset(max(1, int(rows * ADDED_ROWS_FRACTION)), seed=seed + 1)
+        added['Premises name'] = [f"New hospital {i:07d}" for i in range(len(added))]
+        df = pd.concat([df, added], ignore_index=True)
+    return df
+
+
+def dataset_file(data_dir: str, rows: int, file_format: str, generation: int = 1) -> str:
+    """Return the path of a cached dataset file, generating it if needed."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"hospitals_{rows}_g{generation}.{file_format}")
+    if not os.path.exists(path):
+        df = make_dataset(rows, generation)
+        temp_path = os.path.join(data_dir, f"tmp_{os.getpid()}_{os.path.basename(path)}")
+        if file_format == 'csv':
+            df.to_csv(temp_path, index=False)
+        else:
+            df.to_excel(temp_path, index=False, engine='openpyxl')
+        os.replace(temp_path, path)
+    return path
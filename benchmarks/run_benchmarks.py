@@ -0,0 +1,216 @@
+"""Offline benchmarks for the fetch pipeline.
+
+Serves provider-like pages and synthetic CSV/XLSX files from a local HTTP
+server and drives LinkFetcher.fetch_links / download_files end to end. No
+request leaves the machine.
+
+Each (rows, format) case runs in its own process, so its peak RSS is not
+inflated by earlier cases. Peak RSS is reported for that process and for the
+largest of its ingestion workers. Each case runs four scenarios:
+
+    cold          empty data directory, every file is new
+    not_modified  same data again, pages and files answer 304
+    unchanged     validators discarded, files are downloaded and parsed but match
+    changed       a new generation of the data, ~1% of rows modified and some added
+
+Usage (from the repository root):
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --rows 1000 100000 1000000 --formats csv
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --baseline results.json   # Exit 1 on regressions
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def peak_rss_mb(who='self'):
+    """Peak resident set size in MB of this process ('self') or of its largest
+    finished child process ('children'), or None where unsupported."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF if who == 'self' else resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+async def run_scenario(fetcher, sources):
+    """Run one fetch and return its measurements."""
+    fetcher.sources = sources
+    fetcher.urls = sources.urls()
+    fetcher.begin_trace()
+    start = time.perf_counter()
+    results, stats = await fetcher.fetch_links()
+    downloaded = await fetcher.download_files(results)
+    seconds = time.perf_counter() - start
+    trace = fetcher.end_trace()
+
+    spans = trace['spans']
+    request_seconds = [span['seconds'] for span in spans if span['stage'] in ('page_fetch', 'download')]
+    rows = sum(span.get('rows', 0) for span in spans if span['stage'] == 'file_parse')
+    transferred = sum(span.get('bytes', 0) for span in spans if span['stage'] in ('page_fetch', 'download'))
+    return {
+        'seconds': seconds,
+        'links': stats['successful'],
+        'files_saved': sum(len(files) for files in downloaded.values()),
+        'rows_parsed': rows,
+        'mb_transferred': transferred / (1024 * 1024),
+        'rows_per_second': rows / seconds if seconds else 0,
+        'mb_per_second': transferred / (1024 * 1024) / seconds if seconds else 0,
+        'request_p50_ms': float(np.percentile(request_seconds, 50)) * 1000 if request_seconds else None,
+        'request_p95_ms': float(np.percentile(request_seconds, 95)) * 1000 if request_seconds else None,
+        'stage_seconds': {stage: summary['total_seconds'] for stage, summary in trace['stages'].items()},
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+async def run_case(sources_g1, sources_g2):
+    """Run every scenario against a fresh data directory (worker process)."""
+    from config.settings import HEADERS
+    from utils.fetcher import LinkFetcher
+    from utils.session_pool import close_session
+    from utils.sources import SourceRegistry
+
+    sources_g1, sources_g2 = SourceRegistry(sources_g1), SourceRegistry(sources_g2)
+    work_dir = tempfile.mkdtemp(prefix='st-hospital-bench-run-')
+    try:
+        fetcher = LinkFetcher(headers=HEADERS, urls=sources_g1.urls(), download_dir=os.path.join(work_dir, 'downloads'),
+                              sources=sources_g1)
+        results = {}
+        results['cold'] = await run_scenario(fetcher, sources_g1)
+        results['not_modified'] = await run_scenario(fetcher, sources_g1)
+
+        fetcher.validators.entries = {}
+        results['unchanged'] = await run_scenario(fetcher, sources_g1)
+
+        results['changed'] = await run_scenario(fetcher, sources_g2)
+        await close_session()
+
+        # Ingestion workers are only counted once they have exited
+        fetcher.close()
+        for result in results.values():
+            result['worker_peak_rss_mb'] = peak_rss_mb('children')
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def worker(spec):
+    """Entry point of a worker process: run one case and print its results as JSON."""
+    sys.path.insert(0, os.path.join(REPO_ROOT, 'src'))
+    os.chdir(REPO_ROOT)
+    # The fetcher logs to src/data/logs/fetcher.log relative to the repository root
+    os.makedirs(os.path.join('src', 'data', 'logs'), exist_ok=True)
+    import utils.fetcher  # noqa: F401 - configures logging on import
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = asyncio.run(run_case(spec['sources_g1'], spec['sources_g2']))
+    print(json.dumps(results))
+
+
+def run_benchmarks(rows_list, formats, data_dir):
+    """Run every (rows, format) case in a worker process and collect the results."""
+    from datasets import dataset_file
+    from server import ProviderServer
+
+    report = []
+    for rows in rows_list:
+        for file_format in formats:
+            print(f"Preparing {rows:,} row {file_format} datasets...", file=sys.stderr)
+            for generation in (1, 2):
+                dataset_file(data_dir, rows, file_format, generation)
+
+            with ProviderServer(data_dir, rows) as server:
+                spec = {'sources_g1': server.sources(file_format, 1), 'sources_g2': server.sources(file_format, 2)}
+                print(f"Running {rows:,} rows, {file_format}...", file=sys.stderr)
+                completed = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--worker', json.dumps(spec)],
+                    capture_output=True, text=True
+                )
+            if completed.returncode != 0:
+                print(completed.stderr, file=sys.stderr)
+                raise RuntimeError(f"Benchmark worker failed for {rows} rows, {file_format}")
+
+            for scenario, result in json.loads(completed.stdout.strip().splitlines()[-1]).items():
+                report.append({'rows': rows, 'format': file_format, 'scenario': scenario, **result})
+    return report
+
+
+def _format(value, spec):
+    return format(value, spec) if value is not None else '-'
+
+
+def print_report(report):
+    header = f"{'rows':>9} {'fmt':>4} {'scenario':<13} {'seconds':>8} {'rows/s':>10} {'MB/s':>7} " \
+             f"{'req p50 ms':>10} {'req p95 ms':>10} {'peak RSS MB':>11} {'worker RSS MB':>13}"
+    print(header)
+    print('-' * len(header))
+    for r in report:
+        print(f"{r['rows']:>9} {r['format']:>4} {r['scenario']:<13} {r['seconds']:>8.3f} "
+              f"{r['rows_per_second']:>10.0f} {r['mb_per_second']:>7.1f} "
+              f"{_format(r['request_p50_ms'], '>10.1f')} {_format(r['request_p95_ms'], '>10.1f')} "
+              f"{_format(r['peak_rss_mb'], '>11.0f')} {_format(r.get('worker_peak_rss_mb'), '>13.0f')}")
+
+
+def find_regressions(report, baseline, tolerance):
+    """Compare run times with a baseline report and describe cases that got slower."""
+    previous = {(r['rows'], r['format'], r['scenario']): r for r in baseline}
+    regressions = []
+    for r in report:
+        before = previous.get((r['rows'], r['format'], r['scenario']))
+        if before and r['seconds'] > before['seconds'] * (1 + tolerance):
+            regressions.append(f"{r['rows']} rows {r['format']} {r['scenario']}: "
+                               f"{before['seconds']:.3f}s -> {r['seconds']:.3f}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fetch pipeline against a local stand-in server.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="dataset sizes in rows (default: 1000 10000 100000)")
+    parser.add_argument('--formats', nargs='+', choices=['csv', 'xlsx'], default=['csv', 'xlsx'],
+                        help="data file formats (default: csv xlsx)")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'st-hospital-bench'),
+                        help="where generated datasets are cached")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed slowdown against the baseline (default: 0.25 = 25%%)")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(json.loads(args.worker))
+        return
+
+    report = run_benchmarks(args.rows, args.formats, args.data_dir)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = find_regressions(report, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Local stand-in for the provider sites.
+
+Serves provider-like pages and the synthetic data files over HTTP on
+127.0.0.1, with ETag / Last-Modified validators so conditional requests are
+answered with 304 like the real sites.
+
+Routes:
+    /pages/<format>/g<generation>/<slug>       provider page linking to its data file
+    /files/<format>/g<generation>/<slug>.<ext>  data file
+"""
+import hashlib
+import http.server
+import os
+import shutil
+import threading
+from email.utils import formatdate
+
+from datasets import dataset_file
+
+# Page slugs per source id, saved under the real dataset names
+PAGES = {
+    "NZ_public": ("NZ", "public-hospitals", "NZ_Public_Hospitals"),
+    "NZ_private": ("NZ", "private-hospitals", "NZ_Private_Hospitals"),
+    "AU_declared": ("AU", "list-of-declared-hospitals", "AU_Declared_Hospitals"),
+}
+
+# Navigation and body filler so pages are about the size of the real CMS pages
+NAV_LINKS = 400
+BODY_PARAGRAPHS = 300
+
+
+def render_page(slug: str, file_url: str) -> bytes:
+    """Render a provider-like page with one data file link inside <main>."""
+    nav = ''.join(f'<li><a href="/section/{i}">Section {i}</a></li>' for i in range(NAV_LINKS))
+    body = ''.join(f'<p>Paragraph {i} about certified providers and hospital services.</p>'
+                   for i in range(BODY_PARAGRAPHS))
+    html = (
+        f'<!DOCTYPE html><html><head><title>{slug}</title></head><body>'
+        f'<header><nav><ul>{nav}</ul></nav></header>'
+        f'<main><h1>{slug.replace("-", " ").title()}</h1>{body}'
+        f'<div class="file-download"><a href="{file_url}">Download the {slug} list</a></div>'
+        f'</main><footer><a href="/sitemap">Sitemap</a></footer></body></html>'
+    )
+    return html.encode('utf-8')
+
+
+class ProviderHandler(http.server.BaseHTTPRequestHandler):
+    server_version = "BenchmarkProvider/1.0"
+    data_dir = None
+    rows = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body: bytes = None, path: str = None, content_type: str = 'text/html'):
+        """Send a page body or a file, answering 304 if the client's validators match."""
+        if path is not None:
+            stat = os.stat(path)
+            etag = f'"{stat.st_size:x}-{int(stat.st_mtime_ns):x}"'
+            last_modified = formatdate(stat.st_mtime, usegmt=True)
+        else:
+            etag = f'"{hashlib.sha1(body).hexdigest()}"'
+            last_modified = None
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('ETag', etag)
+        if last_modified:
+            self.send_header('Last-Modified', last_modified)
+        self.send_header('Content-Length', str(os.path.getsize(path) if path else len(body)))
+        self.end_headers()
+        if path is not None:
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, self.wfile, 256 * 1024)
+        else:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        parts = self.path.strip('/').split('/')
+        try:
+            kind, file_format, generation, name = parts
+            generation = int(generation.lstrip('g'))
+        except ValueError:
+            self.send_error(404)
+            return
+
+        if kind == 'pages':
+            self._send(render_page(name, f"/files/{file_format}/g{generation}/{name}.{file_format}"))
+        elif kind == 'files':
+            path = dataset_file(self.data_dir, self.rows, file_format, generation)
+            content_type = 'text/csv' if file_format == 'csv' else \
+                'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            self._send(path=path, content_type=content_type)
+        else:
+            self.send_error(404)
+
+
+class ProviderServer:
+    """Threaded HTTP server for one dataset size, started on a free port."""
+
+    def __init__(self, data_dir: str, rows: int):
+        handler = type('Handler', (ProviderHandler,), {'data_dir': data_dir, 'rows': rows})
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def sources(self, file_format: str, generation: int = 1):
+        """Return DATA_SOURCES entries for the stand-in pages."""
+        return [
+            {"id": source_id, "country": country, "label": slug, "dataset": dataset,
+             "url": f"{self.base_url}/pages/{file_format}/g{generation}/{slug}", "link_rules": {"scope": "main"}}
+            for source_id, (country, slug, dataset) in PAGES.items()
+        ]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -5,13 +5,17 @@ import pandas as pd
 import plotly.graph_objects as go
 import asyncio
 import logging
-import smtplib
-import json
-from datetime import datetime, timedelta
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from config.settings import HEADERS, DATA_PROVIDER_URLS, EMAIL_CONFIG
-from utils.fetcher import LinkFetcher
+import mimetypes
+from datetime import datetime
+from config.settings import DATA_PROVIDER_URLS, DATASET_VIEWER, EMAIL_CONFIG
+from utils.sources import SOURCES
+from utils.pipeline import LOG_DIR, filter_active_urls
+from utils.instrumentation import pyinstrument, span_percentiles, stage_percentiles
+from utils.logstore import JsonLinesLog
+from utils.schedule import calculate_next_run, load_scheduler_state, scheduler_daemon_alive
+from utils.service import AppService
+from utils.viewer import open_view
+from utils.notify import send_email
 from streamlit_autorefresh import st_autorefresh
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -33,37 +37,39 @@ st.set_page_config(
     layout="wide"
 )
 
-# Helper function to get source key - defining this early before it's used
-def get_source_key(country, url):
-    """Generate a unique key for each data source"""
-    if "public-hospitals" in url:
-        return f"{country}_public"
-    elif "private-hospitals" in url:
-        return f"{country}_private"
-    elif "declared-hospitals" in url:
-        return f"{country}_declared"
-    else:
-        return f"{country}_{url.split('/')[-1]}"
+@st.cache_resource
+def get_service() -> AppService:
+    """Return the fetcher, status stores and saved configuration shared by all sessions."""
+    return AppService()
+
+service = get_service()
+# Indexed fetch status history for analytics queries
+history_store = service.history_store
+
+def service_changed(topic):
+    """Whether a topic changed since this session last loaded it (always true on a session's first run)."""
+    version = service.version(topic)
+    if st.session_state.get(f'{topic}_version') == version:
+        return False
+    st.session_state[f'{topic}_version'] = version
+    return True
+
+def save_config(topic, config, indent=4):
+    """Save a topic's configuration and let the other sessions know."""
+    service.save_config(topic, config, indent=indent)
+    # This session already has the values it saved
+    st.session_state[f'{topic}_version'] = service.version(topic)
 
 # Initialize session state for data sources
 if 'active_sources' not in st.session_state:
     # Initialize with all sources enabled by default
-    st.session_state.active_sources = {}
-    for country, urls in DATA_PROVIDER_URLS.items():
-        for url in urls:
-            source_key = get_source_key(country, url)
-            st.session_state.active_sources[source_key] = True
-
-# Initialize session state
-if 'fetcher' not in st.session_state:
-    st.session_state.fetcher = LinkFetcher(
-        headers=HEADERS,
-        urls=DATA_PROVIDER_URLS,
-        download_dir=os.path.join('src', 'data', 'downloads')
-    )
+    st.session_state.active_sources = {source.id: True for source in SOURCES}
 
 if 'last_run_time' not in st.session_state:
     st.session_state.last_run_time = None
+# After a fetch from any session, show the last run from the fetch logs
+if service_changed('history'):
+    st.session_state.last_run_time = None
 
 # Initialize scheduling session state
 if 'schedule_enabled' not in st.session_state:
@@ -88,22 +94,28 @@ if 'refresh_counter' not in st.session_state:
     st.session_state.refresh_counter = 0
 if 'run_fetch_on_next_rerun' not in st.session_state:
     st.session_state.run_fetch_on_next_rerun = False
+if 'watched_job' not in st.session_state:
+    st.session_state.watched_job = None  # Id of the background fetch job this session started
+if 'seen_finished_jobs' not in st.session_state:
+    st.session_state.seen_finished_jobs = set()
+if 'source_schedules' not in st.session_state:
+    st.session_state.source_schedules = {}  # Per-source schedule overrides, applied by the headless scheduler
 
-# Load schedule settings from JSON if available
-schedule_config_file = os.path.join('src', 'data', 'config', 'schedule_config.json')
-if os.path.exists(schedule_config_file):
+# Load schedule settings from JSON if available, again whenever another session saves them
+if service_changed('schedule') and os.path.exists(service.config_path('schedule')):
     try:
-        with open(schedule_config_file, 'r') as f:
-            schedule_config = json.load(f)
-            st.session_state.schedule_enabled = schedule_config.get('schedule_enabled', False)
-            st.session_state.schedule_type = schedule_config.get('schedule_type', 'hourly')
-            st.session_state.schedule_hour = schedule_config.get('schedule_hour', 0)
-            st.session_state.schedule_minute = schedule_config.get('schedule_minute', 0)
-            st.session_state.schedule_day = schedule_config.get('schedule_day', 1)
-            st.session_state.schedule_weekday = schedule_config.get('schedule_weekday', 0)
-            st.session_state.custom_minutes = schedule_config.get('custom_minutes', 60)
-            # Don't load dynamic values like next_run_time and interval_ms
-            logger.info("Loaded schedule configuration from file")
+        schedule_config = service.load_config('schedule')
+        st.session_state.schedule_enabled = schedule_config.get('schedule_enabled', False)
+        st.session_state.schedule_type = schedule_config.get('schedule_type', 'hourly')
+        st.session_state.schedule_hour = schedule_config.get('schedule_hour', 0)
+        st.session_state.schedule_minute = schedule_config.get('schedule_minute', 0)
+        st.session_state.schedule_day = schedule_config.get('schedule_day', 1)
+        st.session_state.schedule_weekday = schedule_config.get('schedule_weekday', 0)
+        st.session_state.custom_minutes = schedule_config.get('custom_minutes', 60)
+        st.session_state.active_sources.update(schedule_config.get('active_sources', {}))
+        st.session_state.source_schedules = schedule_config.get('source_schedules', {})
+        # Don't load dynamic values like next_run_time and interval_ms
+        logger.info("Loaded schedule configuration from file")
     except Exception as e:
         logger.error(f"Failed to load schedule configuration: {str(e)}")
 
@@ -128,16 +140,11 @@ if 'custom_minutes_input' not in st.session_state:
     st.session_state.custom_minutes_input = st.session_state.custom_minutes
 
 # Initialize email notification settings
-if 'email_recipients' not in st.session_state:
+if service_changed('recipients'):
     # Check if there's a saved email list
-    email_file = os.path.join('src', 'data', 'config', 'email_recipients.json')
-    if os.path.exists(email_file):
-        try:
-            with open(email_file, 'r') as f:
-                st.session_state.email_recipients = json.load(f)
-        except:
-            st.session_state.email_recipients = []
-    else:
+    try:
+        st.session_state.email_recipients = service.load_config('recipients')
+    except:
         st.session_state.email_recipients = []
 
 if 'smtp_server' not in st.session_state:
@@ -154,100 +161,29 @@ if 'email_notifications_enabled' not in st.session_state:
     st.session_state.email_notifications_enabled = False
 
 # Load email settings from JSON if available
-email_config_file = os.path.join('src', 'data', 'config', 'email_config.json')
-if os.path.exists(email_config_file):
+if service_changed('email') and os.path.exists(service.config_path('email')):
     try:
-        with open(email_config_file, 'r') as f:
-            email_config = json.load(f)
-            st.session_state.email_notifications_enabled = email_config.get('email_notifications_enabled', False)
-            st.session_state.smtp_server = email_config.get('smtp_server', EMAIL_CONFIG["SMTP_SERVER"])
-            st.session_state.smtp_port = email_config.get('smtp_port', EMAIL_CONFIG["SMTP_PORT"])
-            st.session_state.smtp_use_tls = email_config.get('smtp_use_tls', EMAIL_CONFIG["USE_TLS"])
-            st.session_state.sender_email = email_config.get('sender_email', "")
-            st.session_state.sender_password = email_config.get('sender_password', "")
-            logger.info("Loaded email configuration from file")
+        email_config = service.load_config('email')
+        st.session_state.email_notifications_enabled = email_config.get('email_notifications_enabled', False)
+        st.session_state.smtp_server = email_config.get('smtp_server', EMAIL_CONFIG["SMTP_SERVER"])
+        st.session_state.smtp_port = email_config.get('smtp_port', EMAIL_CONFIG["SMTP_PORT"])
+        st.session_state.smtp_use_tls = email_config.get('smtp_use_tls', EMAIL_CONFIG["USE_TLS"])
+        st.session_state.sender_email = email_config.get('sender_email', "")
+        st.session_state.sender_password = email_config.get('sender_password', "")
+        logger.info("Loaded email configuration from file")
     except Exception as e:
         logger.error(f"Failed to load email configuration: {str(e)}")
 
-def run_async(coroutine):
-    """Helper function to run async code in a synchronous context"""
-    loop = asyncio.new_event_loop()
-    result = loop.run_until_complete(coroutine)
-    loop.close()
-    return result
-
 def calculate_next_run_time():
     """Calculate the next run time based on the schedule settings"""
-    now = datetime.now()
-    
-    if st.session_state.schedule_type == "hourly":
-        # Run at the specified minute of each hour
-        if now.minute >= st.session_state.schedule_minute:
-            next_run = now.replace(minute=st.session_state.schedule_minute, second=0, microsecond=0) + timedelta(hours=1)
-        else:
-            next_run = now.replace(minute=st.session_state.schedule_minute, second=0, microsecond=0)
-    
-    elif st.session_state.schedule_type == "daily":
-        # Run at the specified hour and minute each day
-        target_time = now.replace(hour=st.session_state.schedule_hour, 
-                                minute=st.session_state.schedule_minute, 
-                                second=0, microsecond=0)
-        if now >= target_time:
-            next_run = target_time + timedelta(days=1)
-        else:
-            next_run = target_time
-    
-    elif st.session_state.schedule_type == "weekly":
-        # Run on specified weekday (0=Monday, 6=Sunday) at specified time
-        days_ahead = st.session_state.schedule_weekday - now.weekday()
-        
-        # Create target time for comparison
-        target_time = now.replace(hour=st.session_state.schedule_hour,
-                                 minute=st.session_state.schedule_minute,
-                                 second=0, microsecond=0)
-        
-        # If it's the same day but time has passed, schedule for next week
-        if days_ahead == 0 and now >= target_time:
-            days_ahead = 7
-        # If it's a day in the past this week, schedule for next week
-        elif days_ahead < 0:
-            days_ahead += 7
-            
-        # Calculate the next run time
-        next_run = (now.replace(hour=st.session_state.schedule_hour,
-                              minute=st.session_state.schedule_minute,
-                              second=0, microsecond=0) + 
-                   timedelta(days=days_ahead))
-    
-    elif st.session_state.schedule_type == "monthly":
-        # Run on specified day of month at specified time
-        target_day = min(st.session_state.schedule_day, 28)  # To avoid month boundary issues
-        
-        if now.day > target_day or (now.day == target_day and 
-                                   (now.hour > st.session_state.schedule_hour or 
-                                    (now.hour == st.session_state.schedule_hour and 
-                                     now.minute >= st.session_state.schedule_minute))):
-            # Go to next month
-            if now.month == 12:
-                next_run = datetime(now.year + 1, 1, target_day, 
-                                   st.session_state.schedule_hour, 
-                                   st.session_state.schedule_minute)
-            else:
-                next_run = datetime(now.year, now.month + 1, target_day,
-                                   st.session_state.schedule_hour,
-                                   st.session_state.schedule_minute)
-        else:
-            # Still time this month
-            next_run = datetime(now.year, now.month, target_day,
-                               st.session_state.schedule_hour,
-                               st.session_state.schedule_minute)
-    
-    elif st.session_state.schedule_type == "custom":
-        # Custom interval in minutes - simply add the custom interval to current time
-        next_run = now + timedelta(minutes=st.session_state.custom_minutes)
-    
-    else:
-        next_run = now
+    next_run = calculate_next_run({
+        'schedule_type': st.session_state.schedule_type,
+        'schedule_hour': st.session_state.schedule_hour,
+        'schedule_minute': st.session_state.schedule_minute,
+        'schedule_day': st.session_state.schedule_day,
+        'schedule_weekday': st.session_state.schedule_weekday,
+        'custom_minutes': st.session_state.custom_minutes
+    })
     
     # Log the newly calculated next run time    
     logger.info(f"Calculated next run time: {next_run}")
@@ -376,139 +312,114 @@ def handle_scheduled_run(refresh_count):
 
 def get_active_urls():
     """Get the active URLs based on selected checkboxes"""
-    active_urls = {}
-    
-    for country, urls in DATA_PROVIDER_URLS.items():
-        active_urls[country] = []
-        for url in urls:
-            source_key = get_source_key(country, url)
-            if source_key in st.session_state.active_sources and st.session_state.active_sources[source_key]:
-                active_urls[country].append(url)
-    
-    return active_urls
+    return filter_active_urls(DATA_PROVIDER_URLS, st.session_state.active_sources)
 
-async def fetch_data():
-    """Fetch data from sources"""
-    # Get only the active URLs
-    active_urls = get_active_urls()
-    
-    # Update fetcher with only active URLs
-    st.session_state.fetcher.urls = active_urls
-    
-    # Add detailed fetch status logging
-    all_logs = []
-    files_downloaded = {}
-    try:
-        results, stats = await st.session_state.fetcher.fetch_links()
-        
-        # First, check if there are any files to download
-        pre_download_checks = {}
-        for country, urls in active_urls.items():
-            pre_download_checks[country] = {}
-            for url in urls:
-                # Check if the URL was successfully fetched
-                country_results = results.get(country, [])
-                links_for_url = [link for link in country_results if link['base_url'] == url]
-                was_successful = len(links_for_url) > 0
-                
-                # Store result for later use
-                pre_download_checks[country][url] = {
-                    'successful': was_successful,
-                    'links': links_for_url
-                }
-        
-        # Download files only once
-        if results:
-            files_downloaded = await st.session_state.fetcher.download_files(results)
-        
-        # Now create logs with the data_updated flag
-        for country, url_checks in pre_download_checks.items():
-            for url, check_result in url_checks.items():
-                status = "success" if check_result['successful'] else "failed"
-                
-                # Check if this URL's data was updated (files were downloaded)
-                data_updated = False
-                if status == "success" and country in files_downloaded:
-                    # Check if any of the downloaded files came from this URL
-                    # We determine this by checking if the file's base_url matches our current url
-                    for file_name in files_downloaded.get(country, []):
-                        # The data was updated for this URL
-                        file_base = next((link['base_url'] for link in check_result['links'] 
-                                          if st.session_state.fetcher._get_file_name(link['base_url'], country) == file_name), None)
-                        if file_base == url:
-                            data_updated = True
-                            break
-                
-                # Create log entry
-                log_entry = log_fetch_status(country, url, status, data_updated=data_updated)
-                all_logs.append(log_entry)
-        
-        # Update last run time
-        st.session_state.last_run_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        # After updating the logs, clear the cache for load_fetch_logs
-        load_fetch_logs.clear()
-        
-        return results, stats, files_downloaded
-    except Exception as e:
-        # Log any unexpected errors
-        for country, urls in active_urls.items():
-            for url in urls:
-                log_entry = log_fetch_status(country, url, "error", str(e), data_updated=False)
-                all_logs.append(log_entry)
-        
-        logger.error(f"Error fetching data: {str(e)}")
-        
-        # Clear the cache for fetch logs
-        load_fetch_logs.clear()
-        
-        return {}, {"successful": 0, "failed": 0, "total_attempts": 0}, {}
+def start_fetch(profiler=None):
+    """Start a background fetch of the active sources, optionally profiling it, and follow it from this session"""
+    # Runs on the shared loop with the shared fetcher, so the pooled HTTP session is reused across reruns
+    job = service.jobs.submit(get_active_urls(), profiler=profiler)
+    st.session_state.watched_job = job.id
+    return job
+
+def describe_fetch_event(event):
+    """One line of the fetch progress log for a page or file event"""
+    if event['event'] == 'page':
+        if event['links'] is None:
+            return f"{event['source']}: page failed ({event['error']})"
+        return f"{event['source']}: found {event['links']} links"
+    if event['event'] == 'file':
+        size = f", {event['bytes'] / (1024 * 1024):.1f} MB" if event.get('bytes') else ""
+        error = f" ({event['error']})" if event.get('error') else ""
+        return f"{event['dataset']}: {event['status'].replace('_', ' ')}{size}{error}"
+    if event['event'] == 'joined':
+        return f"{event['source']}: joined a fetch already in progress"
+    if event['event'] == 'reused':
+        return f"{event['source']}: fetched by the scheduler meanwhile"
+    return None
+
+def render_fetch_job():
+    """Show the fetch job this session started, or any fetch in progress, until it finishes"""
+    watched = service.jobs.get(st.session_state.watched_job)
+    active = service.jobs.active()
+    job = watched if watched is not None and not watched.finished else (active[0] if active else watched)
+    if job is None:
+        return
+    if job.finished and job.id not in st.session_state.seen_finished_jobs:
+        # Rerun the whole page once so the status and analytics include the new data
+        st.session_state.seen_finished_jobs.add(job.id)
+        st.rerun()
+    if job.finished and job.id != st.session_state.watched_job:
+        return
+
+    progress = job.progress()
+    if job.state == 'queued':
+        label, state = 'Fetch queued behind another fetch...', 'running'
+    elif job.state == 'running':
+        label, state = (f"Fetching data... {progress['pages_done']}/{progress['pages_total']} pages, "
+                        f"{progress['files_done']} files, {progress['bytes'] / (1024 * 1024):.1f} MB"), 'running'
+    elif job.state == 'failed':
+        label, state = f"Fetch failed: {job.error}", 'error'
+    elif job.result['stats'].get('failed'):
+        label, state = f"Fetch completed, {job.result['stats']['failed']} pages failed", 'error'
+    else:
+        label, state = 'Fetch completed!', 'complete'
+
+    with st.status(label, state=state, expanded=not job.finished):
+        for line in filter(None, (describe_fetch_event(event) for event in job.events)):
+            st.write(line)
+        if job.state == 'done':
+            st.write(f"Found {job.result['stats'].get('successful', 0)} links.")
+            downloaded = job.result['files_downloaded']
+            total_files = sum(len(files) for files in downloaded.values())
+            if total_files > 0:
+                st.write(f"Successfully downloaded {total_files} files.")
+                for country, files in downloaded.items():
+                    if files:
+                        st.write(f"- {country}: {', '.join(files)}")
+            else:
+                st.write("No new files needed to be downloaded. All data is up to date.")
+
+def fetch_job_status():
+    """Render the fetch job progress, polling every second while a fetch runs"""
+    polling = bool(service.jobs.active())
+    # While idle, check now and then for fetches started from other sessions
+    st.fragment(render_fetch_job, run_every=1 if polling else 10)()
 
 @st.cache_data(ttl=300)  # Cache data for 5 minutes
-def load_fetch_logs():
-    """Load fetch logs from the status log file."""
-    log_file = os.path.join('src', 'data', 'logs', 'fetch_status.json')
-    if os.path.exists(log_file):
-        try:
-            with open(log_file, 'r') as f:
-                logs = json.load(f)
-            return logs
-        except:
-            return []
-    return []
+def load_fetch_summary(history_version=0):
+    """Load status totals and the latest entry from the fetch history store.
+
+    history_version is only part of the cache key, so a fetch refreshes it for every session.
+    """
+    try:
+        latest = history_store.latest(1)
+        return history_store.status_totals(), (latest[0] if latest else None)
+    except Exception as e:
+        logger.error(f"Failed to load fetch summary: {str(e)}")
+        return {'total': 0}, None
 
-@st.cache_data
-def create_analytics_data(fetch_logs):
-    """Process fetch logs into dataframes for analytics."""
-    if not fetch_logs:
+@st.cache_data(ttl=300)
+def create_analytics_data(recent_count=10, history_version=0):
+    """Query daily status counts and recent activity for the Analytics tab."""
+    if history_store.is_empty():
         return None, None
     
-    # Convert logs to dataframe
-    df = pd.DataFrame(fetch_logs)
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    # Aggregation happens in SQLite, only the rendered rows are loaded
+    status_counts = history_store.daily_status_counts()
+    recent_logs = pd.DataFrame(history_store.latest(recent_count))
+    recent_logs['timestamp'] = pd.to_datetime(recent_logs['timestamp'])
     
-    # Group by timestamp and count statuses
-    df['date'] = df['timestamp'].dt.date
-    status_counts = df.groupby(['date', 'status']).size().unstack(fill_value=0).reset_index()
-    
-    # Make sure all status columns exist
-    for status in ['success', 'failed', 'error']:
-        if status not in status_counts.columns:
-            status_counts[status] = 0
-    
-    # Calculate success rate
-    total = status_counts['success'] + status_counts['failed'] + status_counts['error']
-    status_counts['success_rate'] = status_counts['success'] / total * 100
-    status_counts = status_counts.sort_values('date')
-    
-    return status_counts, df
+    return status_counts, recent_logs
+
+@st.cache_data(ttl=300)
+def load_stage_timings(max_runs=100, history_version=0):
+    """Load per-stage latencies of the most recent fetch runs for the Analytics tab."""
+    trace_log = JsonLinesLog(os.path.join(LOG_DIR, 'fetch_traces.jsonl'))
+    entries = trace_log.read_all(include_rotated=False)[-max_runs:]
+    return stage_percentiles(entries), span_percentiles(entries)
 
 def save_schedule_config():
     """Save the schedule configuration to a file"""
-    config_dir = os.path.join('src', 'data', 'config')
-    os.makedirs(config_dir, exist_ok=True)
-    config_file = os.path.join(config_dir, 'schedule_config.json')
-    
     try:
         config = {
             'schedule_enabled': st.session_state.schedule_enabled,
@@ -518,11 +429,12 @@ def save_schedule_config():
             'schedule_day': st.session_state.schedule_day,
             'schedule_weekday': st.session_state.schedule_weekday,
             'custom_minutes': st.session_state.custom_minutes,
+            'active_sources': st.session_state.active_sources,  # Used by the headless scheduler
+            'source_schedules': st.session_state.source_schedules,  # Likewise
             'last_updated': datetime.now().isoformat()
         }
         
-        with open(config_file, 'w') as f:
-            json.dump(config, f, indent=4)
+        save_config('schedule', config)
         
         logger.info("Saved schedule configuration to file")
         return True
@@ -532,10 +444,6 @@ def save_schedule_config():
 
 def save_email_config():
     """Save the email configuration to a file"""
-    config_dir = os.path.join('src', 'data', 'config')
-    os.makedirs(config_dir, exist_ok=True)
-    config_file = os.path.join(config_dir, 'email_config.json')
-    
     try:
         config = {
             'email_notifications_enabled': st.session_state.email_notifications_enabled,
@@ -547,8 +455,7 @@ def save_email_config():
             'last_updated': datetime.now().isoformat()
         }
         
-        with open(config_file, 'w') as f:
-            json.dump(config, f, indent=4)
+        save_config('email', config)
         
         logger.info("Saved email configuration to file")
         return True
@@ -556,43 +463,6 @@ def save_email_config():
         logger.error(f"Failed to save email configuration: {str(e)}")
         return False
 
-def log_fetch_status(country, url, status, error_message=None, data_updated=False):
-    """Log fetch status to a file with date and status"""
-    log_dir = os.path.join('src', 'data', 'logs')
-    os.makedirs(log_dir, exist_ok=True)
-    log_file = os.path.join(log_dir, 'fetch_status.json')
-    
-    # Load existing logs if available
-    logs = []
-    if os.path.exists(log_file):
-        try:
-            with open(log_file, 'r') as f:
-                logs = json.load(f)
-        except:
-            # If file is corrupted, start with empty logs
-            logs = []
-    
-    # Add new log entry
-    log_entry = {
-        'timestamp': datetime.now().isoformat(),
-        'country': country,
-        'url': url,
-        'status': status,
-        'data_updated': data_updated
-    }
-    
-    if error_message:
-        log_entry['error'] = error_message
-    
-    logs.append(log_entry)
-    
-    # Save logs back to file (keep only the latest 1000 entries to avoid file growth)
-    with open(log_file, 'w') as f:
-        json.dump(logs[-1000:], f, indent=4)
-    
-    logger.info(f"Logged fetch status: {status} for {country} - {url}, Data updated: {data_updated}")
-    return log_entry
-
 def toggle_email_notifications():
     """Toggle email notifications on/off"""
     st.session_state.email_notifications_enabled = not st.session_state.email_notifications_enabled
@@ -601,29 +471,58 @@ def toggle_email_notifications():
     # Save the updated configuration
     save_email_config()
 
-@st.cache_data(ttl=60)  # Cache for 1 minute
-def load_file_data(file_path):
-    """Load data from a file."""
+@st.cache_resource(max_entries=8)
+def open_file_view(file_path, file_signature):
+    """Open a downloaded file in the paged viewer, once per version of the file."""
     try:
-        if file_path.endswith('.csv'):
-            return pd.read_csv(file_path)
-        elif file_path.endswith(('.xlsx', '.xls')):
-            return pd.read_excel(file_path)
-        else:
-            return None
+        return open_view(file_path)
     except Exception as e:
         st.error(f"Error reading file: {str(e)}")
         return None
 
+@st.fragment
+def render_dataset_view(view, key):
+    """Show one page of a dataset with column, filter, sort and paging controls.
+
+    Runs as a fragment, so paging through a dataset only reruns the viewer.
+    """
+    columns = st.multiselect("Columns", view.columns, default=view.columns, key=f"view_columns_{key}")
+    filter_cols = st.columns([1, 2])
+    with filter_cols[0]:
+        filter_column = st.selectbox("Filter column", view.columns, key=f"view_filter_column_{key}")
+    with filter_cols[1]:
+        filter_text = st.text_input("Contains", key=f"view_filter_text_{key}")
+    sort_cols = st.columns([2, 1, 1])
+    with sort_cols[0]:
+        sort_by = st.selectbox("Sort by", [None] + view.columns, key=f"view_sort_by_{key}",
+                               format_func=lambda column: "File order" if column is None else column)
+    with sort_cols[1]:
+        descending = st.toggle("Descending", key=f"view_descending_{key}")
+    with sort_cols[2]:
+        page_sizes = DATASET_VIEWER['PAGE_SIZES']
+        page_size = st.selectbox("Rows per page", page_sizes, key=f"view_page_size_{key}",
+                                 index=page_sizes.index(DATASET_VIEWER['DEFAULT_PAGE_SIZE']))
+    
+    # Work out the matching rows first (kept by the view) to bound the page number
+    order = view.ordering(filter_column, filter_text, sort_by, descending)
+    total = view.num_rows if order is None else len(order)
+    page_count = max(1, -(-total // page_size))
+    page_key = f"view_page_{key}"
+    if st.session_state.get(page_key, 1) > page_count:
+        st.session_state[page_key] = page_count
+    page = st.number_input(f"Page (of {page_count:,})", min_value=1, max_value=page_count, step=1, key=page_key)
+    
+    df, total = view.page(page - 1, page_size, columns, filter_column, filter_text, sort_by, descending)
+    first_row = min((page - 1) * page_size + 1, total)
+    last_row = min(page * page_size, total)
+    st.caption(f"Rows {first_row:,}–{last_row:,} of {total:,}"
+               f"{' matching' if filter_text else ''}, read from the {view.source}")
+    st.dataframe(df, use_container_width=True, height=400)
+
 def save_email_recipients():
     """Save email recipients to file for persistence"""
-    email_dir = os.path.join('src', 'data', 'config')
-    os.makedirs(email_dir, exist_ok=True)
-    email_file = os.path.join(email_dir, 'email_recipients.json')
-    
     try:
-        with open(email_file, 'w') as f:
-            json.dump(st.session_state.email_recipients, f)
+        save_config('recipients', st.session_state.email_recipients, indent=None)
         logger.info(f"Saved {len(st.session_state.email_recipients)} email recipients to file")
         return True
     except Exception as e:
@@ -631,71 +530,19 @@ def save_email_recipients():
         return False
 
 def send_email_notification(subject, message, files_downloaded):
-    """Send email notification to recipients when new files are downloaded"""
+    """Send email notification to recipients with the settings entered in this session"""
     if not st.session_state.email_notifications_enabled or not st.session_state.email_recipients:
         logger.info("Email notifications are disabled or no recipients configured")
         return False
     
-    if not st.session_state.sender_email or not st.session_state.sender_password:
-        logger.warning("Sender email or password not configured")
-        return False
-    
-    try:
-        # Apply prefix to subject
-        full_subject = f"{EMAIL_CONFIG['EMAIL_SUBJECT_PREFIX']}{subject}"
-        
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = f"{EMAIL_CONFIG['EMAIL_FROM_NAME']} <{st.session_state.sender_email}>"
-        
-        # Format recipients according to RFC standards for multiple recipients
-        recipients = st.session_state.email_recipients.copy()
-        
-        # Check maximum recipients
-        if len(recipients) > EMAIL_CONFIG["MAX_RECIPIENTS"]:
-            logger.warning(f"Too many recipients: {len(recipients)}. Trimming to {EMAIL_CONFIG['MAX_RECIPIENTS']}")
-            recipients = recipients[:EMAIL_CONFIG["MAX_RECIPIENTS"]]
-        
-        msg['To'] = ", ".join(recipients)
-        msg['Subject'] = full_subject
-        
-        # Format the email body using template
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # Format files list
-        files_list = ""
-        if files_downloaded:
-            for country, files in files_downloaded.items():
-                if files:
-                    files_list += f"- {country}: {', '.join(files)}\n"
-        
-        # Use appropriate template
-        email_body = EMAIL_CONFIG["TEMPLATES"]["NEW_FILES"].format(
-            message=message,
-            files_list=files_list if files_list else "No specific files listed",
-            timestamp=timestamp
-        )
-        
-        msg.attach(MIMEText(email_body, 'plain'))
-        
-        # Connect to SMTP server and send email
-        server_connection = smtplib.SMTP(st.session_state.smtp_server, st.session_state.smtp_port)
-        
-        if st.session_state.smtp_use_tls:
-            server_connection.starttls()
-        
-        server_connection.login(st.session_state.sender_email, st.session_state.sender_password)
-        server_connection.send_message(msg)
-        server_connection.quit()
-        
-        logger.info(f"Email notification sent to {len(recipients)} recipients")
-        return True
-    
-    except Exception as e:
-        logger.error(f"Failed to send email notification: {str(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
-        return False
+    settings = {
+        'sender_email': st.session_state.sender_email,
+        'sender_password': st.session_state.sender_password,
+        'smtp_server': st.session_state.smtp_server,
+        'smtp_port': st.session_state.smtp_port,
+        'smtp_use_tls': st.session_state.smtp_use_tls
+    }
+    return send_email(settings, st.session_state.email_recipients, subject, message, files_downloaded)
 
 def add_email_recipient():
     """Add a new email recipient to the list"""
@@ -787,42 +634,27 @@ async def main():
     # Check if we need to run a scheduled fetch (from previous rerun)
     if st.session_state.run_fetch_on_next_rerun:
         st.session_state.run_fetch_on_next_rerun = False
-        with st.status('Running scheduled data fetch...', expanded=True) as status:
-            st.write('Fetching links from source websites...')
-            
-            # Get only the active URLs
-            active_urls = get_active_urls()
-            # Update fetcher with only active URLs
-            st.session_state.fetcher.urls = active_urls
-            
-            results, stats = await st.session_state.fetcher.fetch_links()
-            
-            st.write(f"Found {stats['successful']} links.")
-            st.write('Downloading and processing files...')
-            
-            downloaded = await st.session_state.fetcher.download_files(results)
-            total_files = sum(len(files) for files in downloaded.values())
-            
-            # Display results
-            if total_files > 0:
-                st.write(f"Successfully downloaded {total_files} files.")
-                for country, files in downloaded.items():
-                    if files:
-                        st.write(f"- {country}: {', '.join(files)}")
-            else:
-                st.write("No new files needed to be downloaded. All data is up to date.")
-            
-            status.update(label="Scheduled fetch completed!", state="complete")
-            st.session_state.last_run_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            # For custom schedules, immediately calculate the next run time
-            if st.session_state.schedule_enabled:
-                st.session_state.next_run_time = calculate_next_run_time()
-                update_schedule_interval()
-                logger.info(f"After scheduled run, next run set to {st.session_state.next_run_time}")
+        start_fetch()
+        logger.info(f"Started scheduled fetch job {st.session_state.watched_job}")
+        
+        # For custom schedules, immediately calculate the next run time
+        if st.session_state.schedule_enabled:
+            st.session_state.next_run_time = calculate_next_run_time()
+            update_schedule_interval()
+            logger.info(f"After scheduled run, next run set to {st.session_state.next_run_time}")
+    
+    # Progress of background fetches, updated live without blocking the rest of the page
+    fetch_job_status()
+    
+    # When the headless scheduler (src/scheduler.py) is running it owns scheduled
+    # fetches, and the UI only displays its state
+    scheduler_state = load_scheduler_state()
+    daemon_running = scheduler_daemon_alive(scheduler_state)
     
     # Setup auto-refresh if scheduling is enabled
-    if st.session_state.schedule_enabled:
+    if daemon_running:
+        pass
+    elif st.session_state.schedule_enabled:
         # Make sure we have a next run time
         if st.session_state.next_run_time is None:
             st.session_state.next_run_time = calculate_next_run_time()
@@ -871,6 +703,9 @@ async def main():
         fetch_col1, fetch_col2 = st.columns(2)
         with fetch_col1:
             fetch_btn = st.button('🔄 Fetch Now', type="primary", use_container_width=True)
+        with fetch_col2:
+            profile_fetch = st.checkbox('Profile run', help="Capture a profile of the next manual fetch "
+                                        "(saved to src/data/logs/profiles)")
         
 
         st.subheader('Scheduler')
@@ -883,7 +718,18 @@ async def main():
         st.badge(schedule_status, icon=schedule_icon, color=schedule_color)
         
         # Show next scheduled run time
-        if st.session_state.schedule_enabled and st.session_state.next_run_time:
+        if daemon_running:
+            st.caption("Scheduled fetches are run by the headless scheduler.")
+            if scheduler_state.get('next_run'):
+                st.write(f"Next scheduled run: **{datetime.fromisoformat(scheduler_state['next_run']).strftime('%Y-%m-%d %H:%M:%S')}**")
+            if scheduler_state.get('last_run'):
+                st.write(f"Last scheduled run: {datetime.fromisoformat(scheduler_state['last_run']).strftime('%Y-%m-%d %H:%M:%S')}")
+            for source_id, source_state in scheduler_state.get('sources', {}).items():
+                if source_state.get('next_run'):
+                    source = SOURCES.get(source_id)
+                    st.caption(f"{source.label if source else source_id} ({source.country if source else ''}): next run "
+                               f"{datetime.fromisoformat(source_state['next_run']).strftime('%Y-%m-%d %H:%M:%S')}")
+        elif st.session_state.schedule_enabled and st.session_state.next_run_time:
             next_run_str = st.session_state.next_run_time.strftime("%Y-%m-%d %H:%M:%S")
             st.write(f"Next scheduled run: **{next_run_str}**")
         
@@ -1025,59 +871,63 @@ async def main():
             else:
                 st.success("Schedule updated!")
             st.rerun()
+
+        with st.expander("Per-source schedules"):
+            st.caption("Fetch a source on its own interval instead of the schedule above. "
+                       "Applied by the headless scheduler (src/scheduler.py).")
+
+            def update_source_schedule(source_id):
+                minutes = st.session_state[f"source_minutes_{source_id}"]
+                if minutes:
+                    st.session_state.source_schedules[source_id] = {'schedule_type': 'custom', 'custom_minutes': minutes}
+                else:
+                    st.session_state.source_schedules.pop(source_id, None)
+                save_schedule_config()
+
+            for source in SOURCES:
+                override = st.session_state.source_schedules.get(source.id) or {}
+                st.number_input(f"{source.country} {source.label}: every X minutes (0 = schedule above)",
+                                min_value=0,
+                                max_value=10080,
+                                value=int(override.get('custom_minutes', 0)) if override.get('schedule_type') == 'custom' else 0,
+                                on_change=update_source_schedule,
+                                args=(source.id,),
+                                key=f"source_minutes_{source.id}")
     
     with controls_col2:
         st.subheader('Data Sources')
         
         # Show available data sources with toggles
-        for country, urls in DATA_PROVIDER_URLS.items():
+        for country, sources in SOURCES.by_country().items():
             st.write(f"**{country}**")
-            for url in urls:
-                if "public-hospitals" in url:
-                    label = "Public Hospitals"
-                elif "private-hospitals" in url:
-                    label = "Private Hospitals"
-                elif "declared-hospitals" in url:
-                    label = "Declared Hospitals"
-                else:
-                    label = url.split('/')[-1]
-                
-                source_key = get_source_key(country, url)
+            for source in sources:
+                source_key = source.id
                 # Use the source_key for the checkbox
-                st.session_state.active_sources[source_key] = st.checkbox(
-                    label, 
+                enabled = st.checkbox(
+                    source.label or source_key,
                     value=st.session_state.active_sources.get(source_key, True),
                     key=f"source_{source_key}"
                 )
+                # Persist changes so the headless scheduler fetches the same sources
+                if enabled != st.session_state.active_sources.get(source_key, True):
+                    st.session_state.active_sources[source_key] = enabled
+                    save_schedule_config()
                 
     with controls_col3:
         st.subheader('Status')
-        fetch_logs = load_fetch_logs()
+        status_totals, last_run = load_fetch_summary(service.version('history'))
         
         status_cols = st.columns(3)
         with status_cols[0]:
-            if fetch_logs:
-                last_run = fetch_logs[-1]
-                # Modified to handle missing 'total_attempts' key
-                if 'total_attempts' in last_run:
-                    success_rate = (last_run['successful'] / last_run['total_attempts'] * 100) if last_run['total_attempts'] > 0 else 0
-                else:
-                    # If fetch_status.json entries don't have total_attempts, use the status column
-                    success_count = sum(1 for log in fetch_logs if log.get('status') == 'success')
-                    total_count = len(fetch_logs)
-                    success_rate = (success_count / total_count * 100) if total_count > 0 else 0
+            if last_run:
+                success_rate = (status_totals['success'] / status_totals['total'] * 100) if status_totals['total'] > 0 else 0
                 st.metric('Success Rate', f"{success_rate:.1f}%")
             else:
                 st.metric('Success Rate', 'N/A')
                 
         with status_cols[1]:
-            if fetch_logs:
-                # Modified to handle missing 'successful' key
-                if 'successful' in last_run:
-                    st.metric('Files Downloaded', last_run['successful'])
-                else:
-                    success_count = sum(1 for log in fetch_logs if log.get('status') == 'success')
-                    st.metric('Files Downloaded', success_count)
+            if last_run:
+                st.metric('Files Downloaded', status_totals['success'])
                 # If we don't have a last_run_time from session state, use the one from fetch logs
                 if not st.session_state.last_run_time:
                     st.session_state.last_run_time = pd.to_datetime(last_run['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
@@ -1106,47 +956,22 @@ async def main():
 
         
         
-        # Progress bar for running manual fetch
+        # Start the manual fetch in the background; its progress is shown at the top of the page
         if fetch_btn:
-            with st.status('Running data fetch...', expanded=True) as status:
-                # Get only the active URLs
-                active_urls = get_active_urls()
-                # Update fetcher with only active URLs
-                active_data_source = st.session_state.fetcher.urls = active_urls
-                get_links = [url for country_urls in active_data_source.values() for url in country_urls]
-
-
-                st.write(f'Fetching links from source websites... {get_links}',)
-                
-                
-                results, stats, downloaded = await fetch_data()
-                
-                st.write(f"Found {stats['successful']} links.")
-                st.write('Downloading and processing files...')
-                
-                total_files = sum(len(files) for files in downloaded.values())
-                
-                # Display results
-                if total_files > 0:
-                    st.write(f"Successfully downloaded {total_files} files.")
-                    for country, files in downloaded.items():
-                        if files:
-                            st.write(f"- {country}: {', '.join(files)}")
-                    
-                    # Clear the analytics data cache
-                    create_analytics_data.clear()
-                else:
-                    st.write("No new files needed to be downloaded. All data is up to date.")
-                
-                status.update(label="Fetch completed!", state="complete")
-                st.session_state.last_run_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                
-                # Force a rerun to update the analytics
-                st.rerun()
+            start_fetch(
+                profiler=('pyinstrument' if pyinstrument is not None else 'cprofile') if profile_fetch else None
+            )
+            st.rerun()
 
     tab1, tab2, tab3 = st.tabs(["📊 Analytics", "📁 Downloaded Files", "⚙️ Settings"])
     with tab1:
-        status_counts, log_df = create_analytics_data(fetch_logs)
+        # Provider hosts the app's fetcher is skipping after repeated failures
+        tripped = {host: entry for host, entry in service.fetcher.breaker.snapshot().items() if entry['state'] != 'closed'}
+        if tripped:
+            st.warning("Skipping provider hosts after repeated failures: " + ", ".join(
+                f"{host} ({entry['state']}, {entry['failures']} failures)" for host, entry in tripped.items()))
+        
+        status_counts, log_df = create_analytics_data(history_version=service.version('history'))
         
         if status_counts is not None and not status_counts.empty:
             chart_cols = st.columns(2)
@@ -1171,14 +996,10 @@ async def main():
             # Add a table with recent fetch activity
             st.subheader("Recent Fetch Activity")
             if log_df is not None and not log_df.empty:
-                # Show last 10 fetch activities
-                recent_logs = log_df.sort_values('timestamp', ascending=False).head(10)
+                # Show last 10 fetch activities (already newest first)
+                recent_logs = log_df
                 recent_logs['time'] = recent_logs['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
                 
-                # Set default value for data_updated if it doesn't exist in older logs
-                if 'data_updated' not in recent_logs.columns:
-                    recent_logs['data_updated'] = False
-                
                 st.dataframe(
                     recent_logs[['time', 'country', 'status', 'data_updated', 'url']],
                     use_container_width=True,
@@ -1201,11 +1022,23 @@ async def main():
                 )
         else:
             st.info('No fetch history available yet. Run a fetch to see analytics.')
+        
+        stage_timings, overall_percentiles = load_stage_timings(history_version=service.version('history'))
+        if not stage_timings.empty:
+            st.subheader('Stage Latency')
+            timing_cols = st.columns(2)
+            with timing_cols[0]:
+                st.caption('p95 seconds per stage, by run')
+                st.line_chart(stage_timings, x='timestamp', y='p95_seconds', color='stage')
+            with timing_cols[1]:
+                st.caption('Percentiles over the last 100 runs')
+                st.dataframe(overall_percentiles, use_container_width=True)
     
     with tab2:
         download_dir = os.path.join('src', 'data', 'downloads')
         if os.path.exists(download_dir):
-            files = os.listdir(download_dir)
+            # Only list data files, not their sidecar manifests
+            files = [file for file in os.listdir(download_dir) if file.endswith(('.csv', '.xlsx', '.xls'))]
             if files:
                 # Group files by country
                 files_by_country = {}
@@ -1230,6 +1063,7 @@ async def main():
                             
                             # We'll populate this once a file is selected
                         
+                        view = None
                         col1, col2 = st.columns([1, 3])
                         with col1:
                             selected_file = st.selectbox(
@@ -1247,31 +1081,31 @@ async def main():
                                 st.write(f"**Size:** {file_size_kb:.1f} KB")
                                 st.write(f"**Modified:** {file_modified}")
                                 
-                                df = load_file_data(file_path)
-                                if df is not None:
+                                view = open_file_view(file_path, (file_stats.st_mtime_ns, file_stats.st_size))
+                                if view is not None:
+                                    st.write(f"**Rows:** {view.num_rows:,}")
+                                    
                                     # Show hospital type distribution for AU
-                                    if country == "AU" and not df.empty and len(df.columns) > 0:
-                                        first_col = df.columns[0]
-                                        
-                                        # Count PRIVATE and PUBLIC values in the first column
-                                        type_counts = df[first_col].value_counts()
+                                    if country == "AU" and view.num_rows > 0 and len(view.columns) > 0:
+                                        # Count PRIVATE and PUBLIC values in the first column, reading only that column
+                                        type_counts = view.value_counts(view.columns[0])
                                         private_count = type_counts.get("PRIVATE", 0)
                                         public_count = type_counts.get("PUBLIC", 0)
-                                        other_count = len(df) - private_count - public_count
+                                        other_count = view.num_rows - private_count - public_count
                                         
                                         # Show counts in the stats container
                                         with stats_container:
                                             stat_cols = st.columns(3)
                                             with stat_cols[0]:
                                                 st.metric("Private Hospitals", private_count)
-                                                st.progress(private_count / len(df))
+                                                st.progress(private_count / view.num_rows)
                                             with stat_cols[1]:
                                                 st.metric("Public Hospitals", public_count)
-                                                st.progress(public_count / len(df))
+                                                st.progress(public_count / view.num_rows)
                                             if other_count > 0:
                                                 with stat_cols[2]:
                                                     st.metric("Other Types", other_count)
-                                                    st.progress(other_count / len(df))
+                                                    st.progress(other_count / view.num_rows)
                                             
                                             # Add a pie chart to visualize distribution
                                             if private_count > 0 or public_count > 0:
@@ -1285,20 +1119,20 @@ async def main():
                                                 fig.update_layout(margin=dict(t=0, b=0, l=0, r=0), height=200)
                                                 st.plotly_chart(fig, use_container_width=True)
                                     
-                                    st.download_button(
-                                        "⬇️ Download file",
-                                        df.to_csv(index=False).encode('utf-8'),
-                                        selected_file,
-                                        f"text/csv",
-                                        key=f'download_{country}',
-                                        use_container_width=True
-                                    )
+                                    # Serve the stored file as is instead of re-encoding its data
+                                    with open(file_path, 'rb') as f:
+                                        st.download_button(
+                                            "⬇️ Download file",
+                                            f,
+                                            selected_file,
+                                            mimetypes.guess_type(selected_file)[0] or 'application/octet-stream',
+                                            key=f'download_{country}',
+                                            use_container_width=True
+                                        )
                         
                         with col2:
-                            if selected_file:
-                                df = load_file_data(file_path)
-                                if df is not None:
-                                    st.dataframe(df, use_container_width=True, height=400)
+                            if selected_file and view is not None:
+                                render_dataset_view(view, f"{country}_{selected_file}")
             else:
                 st.info("No downloaded files available.")
         else:
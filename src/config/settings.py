@@ -2,8 +2,7 @@ HEADERS = {
     'accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
     'accept-encoding': 'gzip, deflate, br, zstd',
     'accept-language': 'en-US,en;q=0.9',
-    'cache-control': 'no-cache',
-    'pragma': 'no-cache',
+    'cache-control': 'max-age=0',  # Revalidate, but allow 304 Not Modified responses
     'priority': 'u=0, i',
     'sec-ch-ua': '"Chromium";v="134", "Not:A-Brand";v="24", "Microsoft Edge";v="134"',
     'sec-ch-ua-mobile': '?0',
@@ -22,14 +21,135 @@ BASE_URLS = {
     "AU": "https://www.health.gov.au"
 }
 
+# Data sources, one entry per provider page:
+#   id          Unique id, used for the source toggles and in the fetch logs
+#   country     Country the source belongs to
+#   label       Name shown in the app
+#   url         Provider page that links to the data file
+#   dataset     Name the data is saved under (src/data/downloads/<dataset>.csv)
+#   link_rules  Where to look for download links on the page. "scope" is a simple selector
+#               (tag, #id, .class, tag#id or tag.class); links outside the first matching
+#               element are ignored. The whole page is scanned if nothing matches or the
+#               element holds no data links.
+#               "expected_links" stops parsing once that many links have been found.
+#   ingestion   How the downloaded file is parsed: "engine" ("auto" uses calamine when
+#               python-calamine is installed, otherwise openpyxl; or "calamine" / "openpyxl"),
+#               "sheet" (name or index), "header" (header row index), "usecols" (columns to
+#               keep) and "dtypes" (e.g. {"Postcode": "string"}). By default the first sheet
+#               is read in full with its first row as the header.
+#   schedule    Optional schedule for this source, used by the headless scheduler instead of
+#               the global one. Same keys as schedule_config.json, e.g. {"schedule_type": "custom",
+#               "custom_minutes": 15} or {"schedule_type": "daily", "schedule_hour": 3}. Keys it
+#               leaves out, including schedule_enabled, come from the global schedule.
+DATA_SOURCES = [
+    {
+        "id": "NZ_public",
+        "country": "NZ",
+        "label": "Public Hospitals",
+        "url": "https://www.health.govt.nz/regulation-legislation/certification-of-health-care-services/certified-providers/public-hospitals",
+        "dataset": "NZ_Public_Hospitals",
+        "link_rules": {"scope": "main"},
+        "ingestion": {},
+        "schedule": None,
+    },
+    {
+        "id": "NZ_private",
+        "country": "NZ",
+        "label": "Private Hospitals",
+        "url": "https://www.health.govt.nz/regulation-legislation/certification-of-health-care-services/certified-providers/private-hospitals",
+        "dataset": "NZ_Private_Hospitals",
+        "link_rules": {"scope": "main"},
+        "ingestion": {},
+        "schedule": None,
+    },
+    {
+        "id": "AU_declared",
+        "country": "AU",
+        "label": "Declared Hospitals",
+        "url": "https://www.health.gov.au/resources/publications/list-of-declared-hospitals?language=en",
+        "dataset": "AU_Declared_Hospitals",
+        "link_rules": {"scope": "main"},
+        "ingestion": {"engine": "auto", "sheet": 0, "header": 0},
+        "schedule": None,
+    },
+]
+
+# Provider page URLs per country, in DATA_SOURCES order
 DATA_PROVIDER_URLS = {
-    "NZ": [
-        "https://www.health.govt.nz/regulation-legislation/certification-of-health-care-services/certified-providers/public-hospitals", 
-        "https://www.health.govt.nz/regulation-legislation/certification-of-health-care-services/certified-providers/private-hospitals"
-    ],
-    "AU": [
-        "https://www.health.gov.au/resources/publications/list-of-declared-hospitals?language=en"
-    ]
+    country: [source["url"] for source in DATA_SOURCES if source["country"] == country]
+    for country in dict.fromkeys(source["country"] for source in DATA_SOURCES)
+}
+
+# HTML parser used to extract download links from provider pages
+LINK_EXTRACTION = {
+    "PARSER": "auto",  # "lxml", "stdlib" or "auto" (lxml when installed)
+}
+
+# Concurrency limits for fetching provider pages and data files
+FETCH_CONCURRENCY = {
+    "MAX_CONCURRENT_REQUESTS": 8,  # Across all hosts
+    "MAX_REQUESTS_PER_HOST": 2,    # Per host (e.g. www.health.govt.nz, www.health.gov.au)
+}
+
+# Worker processes that parse provider pages and parse, compare and save downloaded files,
+# keeping the fetch event loop free for network I/O. Workers start on demand, up to
+# MAX_WORKERS (None for one per CPU). 0 does all parsing in the fetching process.
+INGESTION_WORKERS = {
+    "MAX_WORKERS": 4,
+}
+
+# Headless scheduler: each source's run time is pushed back by a random 0 to JITTER_SECONDS,
+# so sources on the same schedule do not all hit the provider sites at once
+SCHEDULER = {
+    "JITTER_SECONDS": 60,
+}
+
+# Timeouts, retries and circuit breaking for requests to provider sites
+RETRY_CONFIG = {
+    "PAGE_TIMEOUT_SECONDS": 30,       # Per provider page request
+    "DOWNLOAD_TIMEOUT_SECONDS": 300,  # Per data file download, including the body
+    "ATTEMPTS": 3,                    # Including the first try
+    "BACKOFF_MULTIPLIER": 1,          # Jittered exponential backoff, in seconds
+    "BACKOFF_MAX_SECONDS": 20,
+    "RETRY_STATUS_CODES": [429, 500, 502, 503, 504],
+    "BREAKER_FAILURE_THRESHOLD": 3,   # Consecutive failures before a host is skipped
+    "BREAKER_COOLDOWN_SECONDS": 600,  # How long a failing host is skipped
+}
+
+# Column that uniquely identifies a row in each dataset, used for the row-level changelog to
+# report modified rows. A list gives candidates tried in order, since providers rename headers;
+# names are matched ignoring case. Datasets without an entry, or whose key column is missing
+# or not unique, are diffed by whole-row identity instead (a changed row shows up as one
+# removal plus one addition).
+DATASET_KEY_COLUMNS = {
+    "NZ_Public_Hospitals": ["Premises name", "Name"],
+    "NZ_Private_Hospitals": ["Premises name", "Name"],
+    "AU_Declared_Hospitals": ["Hospital name", "Name"],
+}
+
+# Columns of each dataset stored as pandas categoricals (a few distinct values repeated on
+# many rows). Names are matched ignoring case; columns a dataset does not have are skipped.
+DATASET_CATEGORICALS = {
+    "AU_Declared_Hospitals": ["Hospital type", "State"],
+}
+
+# Retention policy for the versioned Parquet snapshots in src/data/snapshots
+SNAPSHOT_RETENTION = {
+    "KEEP_LAST": 30,      # Versions kept per dataset
+    "MAX_AGE_DAYS": 365,  # Older versions are removed (the newest is always kept)
+}
+
+# Dataset viewer in the Downloaded Files tab: rows are read one page at a time
+DATASET_VIEWER = {
+    "PAGE_SIZES": [50, 100, 500, 1000],
+    "DEFAULT_PAGE_SIZE": 100,
+    "CACHED_ORDERINGS": 8,  # Filtered and sorted row orders kept per open dataset
+}
+
+# Rotation of the append-only JSON Lines logs in src/data/logs (rotated files are kept)
+LOG_ROTATION = {
+    "MAX_BYTES": 5 * 1024 * 1024,  # Rotate once the current file reaches this size
+    "MAX_AGE_DAYS": 30,            # Rotate once the oldest entry in the current file is this old
 }
 
 # Email notification settings
@@ -38,6 +158,7 @@ EMAIL_CONFIG = {
     "SMTP_SERVER": "smtp.gmail.com",
     "SMTP_PORT": 587,
     "USE_TLS": True,  # Use TLS encryption
+    "SMTP_TIMEOUT_SECONDS": 30,  # Notifications are sent after fetches, so a stuck server must not hold them up
     
     # Email content settings
     "EMAIL_SUBJECT_PREFIX": "[Hospital Data Fetcher] ",
@@ -0,0 +1,213 @@
+"""Headless scheduler for the Hospital Data Fetcher.
+
+Runs scheduled fetches without a browser session. The schedule is read from
+src/data/config/schedule_config.json (saved by the Streamlit app) and the
+scheduler's state is published to src/data/config/scheduler_state.json for
+the app to display.
+
+Each data source runs on its own schedule (the global one unless the source
+overrides it), so a run fetches only the sources that are due.
+
+Usage (from the repository root):
+    python src/scheduler.py          # Run until interrupted
+    python src/scheduler.py --once   # Run a single fetch and exit
+    python src/scheduler.py --once --profile cprofile   # ...and profile it
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+from config.settings import HEADERS, DATA_PROVIDER_URLS
+from utils.fetcher import LinkFetcher
+from utils.instrumentation import PROFILERS
+from utils.pipeline import filter_active_urls, get_source_key, open_status_stores, run_fetch
+from utils.schedule import (SCHEDULE_CONFIG_FILE, SCHEDULER_STATE_FILE, TimerQueue, calculate_next_run,
+                            load_schedule_config, source_schedule, with_jitter)
+from utils.notify import notify_new_files
+from utils.service import config_path
+from utils.singleflight import SourceFlights
+from utils.sources import SOURCES
+from utils.statefile import read_json, write_json
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join('src', 'scheduler.log')),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('hospital_fetcher.scheduler')
+
+# Schedule fields that change when the next run happens
+SCHEDULE_FIELDS = ('schedule_enabled', 'schedule_type', 'schedule_hour', 'schedule_minute',
+                   'schedule_day', 'schedule_weekday', 'custom_minutes')
+
+
+class Scheduler:
+    """Runs LinkFetcher on the schedules saved by the app, on an asyncio loop."""
+
+    def __init__(self, poll_seconds: int = 30):
+        self.poll_seconds = poll_seconds
+        self.fetcher = LinkFetcher(
+            headers=HEADERS,
+            urls=DATA_PROVIDER_URLS,
+            download_dir=os.path.join('src', 'data', 'downloads')
+        )
+        self.status_log, self.history_store = open_status_stores()
+        self.flights = SourceFlights()  # Shares each source's fetch with the app if it is fetching it too
+        self.config = {}
+        self.config_mtime = None
+        self.queue = TimerQueue()  # Next run time of each scheduled source
+        self.schedules = {}  # Schedule of each active source
+        self.source_runs = {}  # Last run time of each source
+        self.last_run = None
+        self.last_result = None
+
+    @property
+    def next_run(self):
+        return self.queue.next_run()
+
+    def reload_config(self):
+        """Reload the schedules when the app saves new ones, rescheduling the sources whose schedule changed."""
+        mtime = os.path.getmtime(SCHEDULE_CONFIG_FILE) if os.path.exists(SCHEDULE_CONFIG_FILE) else None
+        if mtime == self.config_mtime:
+            return
+        config = load_schedule_config()
+        self.config = config
+        self.config_mtime = mtime
+
+        active_sources = config.get('active_sources', {})
+        for source in SOURCES:
+            schedule = source_schedule(config, source) if active_sources.get(source.id, True) else None
+            if schedule is not None:
+                schedule = {k: schedule.get(k) for k in SCHEDULE_FIELDS}
+            if source.id in self.schedules and schedule == self.schedules[source.id]:
+                continue
+            self.schedules[source.id] = schedule
+            if schedule and schedule.get('schedule_enabled'):
+                self.queue.schedule(source.id, with_jitter(calculate_next_run(schedule)))
+                logger.info(f"Scheduled {source.id} ({schedule.get('schedule_type')}), "
+                            f"next run: {self.queue.run_times()[source.id]}")
+            else:
+                self.queue.cancel(source.id)
+                logger.info(f"{source.id} is not scheduled")
+
+    def publish_state(self, running: bool = True):
+        """Write the scheduler state for the app to display."""
+        run_times = self.queue.run_times()
+        state = {
+            'pid': os.getpid(),
+            'heartbeat': datetime.now().isoformat() if running else None,
+            'schedule_enabled': bool(self.config.get('schedule_enabled')),
+            'schedule_type': self.config.get('schedule_type'),
+            'next_run': self.next_run.isoformat() if self.next_run else None,
+            'last_run': self.last_run.isoformat() if self.last_run else None,
+            'last_result': self.last_result,
+            'sources': {
+                source_id: {
+                    'schedule_type': (schedule or {}).get('schedule_type'),
+                    'next_run': run_times[source_id].isoformat() if source_id in run_times else None,
+                    'last_run': self.source_runs[source_id].isoformat() if source_id in self.source_runs else None
+                }
+                for source_id, schedule in self.schedules.items()
+            }
+        }
+        write_json(SCHEDULER_STATE_FILE, state)
+
+    async def run_once(self, profiler=None, source_ids=None):
+        """Fetch the active sources once (only ``source_ids`` if given), optionally profiling the run."""
+        active_urls = filter_active_urls(DATA_PROVIDER_URLS, self.config.get('active_sources'))
+        if source_ids is not None:
+            active_urls = {country: [url for url in urls if get_source_key(country, url) in source_ids]
+                           for country, urls in active_urls.items()}
+            active_urls = {country: urls for country, urls in active_urls.items() if urls}
+        logger.info(f"Running scheduled fetch for {sum(len(urls) for urls in active_urls.values())} sources")
+
+        async def fetch(urls):
+            results, stats, downloaded = await run_fetch(self.fetcher, urls, self.status_log, self.history_store,
+                                                         profiler=profiler)
+            await asyncio.to_thread(notify_new_files, read_json(config_path('email'), {}),
+                                    read_json(config_path('recipients'), []), downloaded, dict(self.fetcher.changes))
+            return results, stats, downloaded
+
+        self.last_run = datetime.now()
+        _, stats, downloaded = await self.flights.run(active_urls, fetch)
+        self.last_result = {
+            'sources': sorted(get_source_key(country, url) for country, urls in active_urls.items() for url in urls),
+            'links_found': stats.get('successful', 0),
+            'failed': stats.get('failed', 0),
+            'files_downloaded': {country: files for country, files in downloaded.items() if files}
+        }
+        logger.info(f"Scheduled fetch completed: {self.last_result}")
+
+    async def publish_heartbeats(self):
+        """Publish the state every poll interval, also while a fetch is running."""
+        while True:
+            self.publish_state()
+            await asyncio.sleep(self.poll_seconds)
+
+    async def run_forever(self):
+        """Fetch each source whenever it is due until cancelled."""
+        logger.info(f"Scheduler started (pid {os.getpid()})")
+        # A long fetch must not make the app think the daemon has stopped
+        heartbeats = asyncio.create_task(self.publish_heartbeats())
+        try:
+            while True:
+                self.reload_config()
+
+                # Sources that fall due together are fetched in one run
+                now = datetime.now()
+                due = self.queue.pop_due(now)
+                if due:
+                    try:
+                        await self.run_once(source_ids=set(due))
+                    except Exception as e:
+                        logger.error(f"Scheduled fetch failed: {str(e)}")
+                        self.last_result = {'sources': sorted(due), 'error': str(e)}
+                    for source_id in due:
+                        self.source_runs[source_id] = now
+                        self.queue.schedule(source_id, with_jitter(calculate_next_run(self.schedules[source_id])))
+                    logger.info(f"Next run at {self.next_run}")
+                    self.publish_state()
+
+                # Sleep until the next run, but wake up regularly for config changes
+                sleep_seconds = self.poll_seconds
+                if self.next_run is not None:
+                    sleep_seconds = min(sleep_seconds, max(0, (self.next_run - datetime.now()).total_seconds()))
+                await asyncio.sleep(sleep_seconds)
+        finally:
+            heartbeats.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scheduled hospital data fetches without the web UI.")
+    parser.add_argument('--once', action='store_true', help="run a single fetch now and exit")
+    parser.add_argument('--poll-seconds', type=int, default=30,
+                        help="how often to check for schedule changes (default: 30)")
+    parser.add_argument('--profile', choices=PROFILERS,
+                        help="profile the fetch (only with --once); reports go to src/data/logs/profiles")
+    args = parser.parse_args()
+    if args.profile and not args.once:
+        parser.error("--profile can only be used with --once")
+
+    scheduler = Scheduler(poll_seconds=args.poll_seconds)
+    try:
+        if args.once:
+            scheduler.reload_config()
+            asyncio.run(scheduler.run_once(profiler=args.profile))
+        else:
+            asyncio.run(scheduler.run_forever())
+    except KeyboardInterrupt:
+        logger.info("Scheduler stopped")
+    finally:
+        scheduler.fetcher.close()
+        if not args.once:
+            scheduler.publish_state(running=False)
+
+
+if __name__ == "__main__":
+    main()
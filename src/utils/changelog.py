@@ -0,0 +1,196 @@
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from utils.normalize import cell_mismatch, normalize_column, normalize_frame
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RowDiff:
+    """Row-level differences between two versions of a dataset."""
+    key_column: Optional[str]
+    added: List[Dict] = field(default_factory=list)  # {'key': ..., 'row': {...}}
+    removed: List[Dict] = field(default_factory=list)  # {'key': ..., 'row': {...}}
+    modified: List[Dict] = field(default_factory=list)  # {'key': ..., 'changes': {column: [old, new]}}
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.modified)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            'added': len(self.added),
+            'removed': len(self.removed),
+            'modified': len(self.modified)
+        }
+
+
+def _to_records(df: pd.DataFrame) -> List[Dict]:
+    """Convert a DataFrame to JSON-safe records (NaN becomes None)."""
+    return json.loads(df.to_json(orient='records', date_format='iso'))
+
+
+def _json_value(value):
+    """Convert a single cell value to something JSON can represent."""
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _key_values(df: pd.DataFrame, key_column: str) -> pd.Series:
+    """Normalize a key column so keys read from CSV and Excel line up."""
+    key = normalize_column(df[key_column]).reset_index(drop=True)
+    if pd.api.types.is_float_dtype(key):
+        # Whole-number keys should not pick up a trailing ".0"
+        values = key.to_numpy()
+        whole = np.isfinite(values) & (np.mod(values, 1) == 0)
+        strings = key.astype(str).astype(object)
+        strings[whole] = key[whole].astype('int64').astype(str)
+        key = strings.where(key.notna(), None)
+    return key
+
+
+def find_key_column(old_df: pd.DataFrame, new_df: pd.DataFrame, candidates: Union[str, List[str], None]) -> Optional[str]:
+    """Return the first candidate key column that both versions have.
+
+    Names are matched ignoring case and surrounding whitespace, and the
+    column's name in the new version is returned.
+    """
+    if not candidates:
+        return None
+    if isinstance(candidates, str):
+        candidates = [candidates]
+    old_columns = {str(column).strip().lower() for column in old_df.columns}
+    new_columns = {str(column).strip().lower(): column for column in new_df.columns}
+    for candidate in candidates:
+        wanted = str(candidate).strip().lower()
+        if wanted in old_columns and wanted in new_columns:
+            return new_columns[wanted]
+    return None
+
+
+def _row_identity_diff(old_df: pd.DataFrame, new_df: pd.DataFrame) -> RowDiff:
+    """Diff two frames by whole-row identity when there is no usable key."""
+    old_hash = pd.util.hash_pandas_object(normalize_frame(old_df), index=False).to_numpy()
+    new_hash = pd.util.hash_pandas_object(normalize_frame(new_df), index=False).to_numpy()
+
+    added = ~np.isin(new_hash, old_hash)
+    removed = ~np.isin(old_hash, new_hash)
+    return RowDiff(
+        key_column=None,
+        added=[{'key': None, 'row': row} for row in _to_records(new_df.reset_index(drop=True)[added])],
+        removed=[{'key': None, 'row': row} for row in _to_records(old_df.reset_index(drop=True)[removed])]
+    )
+
+
+def diff_rows(old_df: pd.DataFrame, new_df: pd.DataFrame, key_column: Union[str, List[str], None] = None) -> RowDiff:
+    """Report added, removed and modified rows between two dataset versions.
+
+    Rows are matched on ``key_column``, or on the first of a list of candidate
+    columns that both versions have (see find_key_column). If no key is
+    configured, or the key is missing or not unique in either version, rows
+    are matched by their whole content instead and changes show up as a
+    removal plus an addition.
+    """
+    candidates = key_column
+    key_column = find_key_column(old_df, new_df, candidates)
+    if key_column is None:
+        if candidates:
+            logger.warning(f"Key column {candidates} not found, falling back to whole-row diff")
+        return _row_identity_diff(old_df, new_df)
+    # Match the old version's spelling of the key to the new one
+    old_df = old_df.rename(columns={column: key_column for column in old_df.columns
+                                    if str(column).strip().lower() == str(key_column).strip().lower()})
+
+    old_df = old_df.reset_index(drop=True)
+    new_df = new_df.reset_index(drop=True)
+    old_keys = _key_values(old_df, key_column)
+    new_keys = _key_values(new_df, key_column)
+    if not old_keys.is_unique or not new_keys.is_unique:
+        logger.warning(f"Key column {key_column} is not unique, falling back to whole-row diff")
+        return _row_identity_diff(old_df, new_df)
+
+    diff = RowDiff(key_column=key_column)
+    added = ~new_keys.isin(old_keys)
+    removed = ~old_keys.isin(new_keys)
+    diff.added = [{'key': key, 'row': row} for key, row in zip(new_keys[added], _to_records(new_df[added]))]
+    diff.removed = [{'key': key, 'row': row} for key, row in zip(old_keys[removed], _to_records(old_df[removed]))]
+
+    # Line up rows present in both versions by key
+    old_pos = pd.Series(np.arange(len(old_keys)), index=old_keys)
+    new_pos = pd.Series(np.arange(len(new_keys)), index=new_keys)
+    common = old_pos.index.intersection(new_pos.index)
+    old_common = old_df.iloc[old_pos[common].to_numpy()].reset_index(drop=True)
+    new_common = new_df.iloc[new_pos[common].to_numpy()].reset_index(drop=True)
+
+    # Compare shared columns vectorized, then only visit changed cells
+    changes = {}
+    for col in [c for c in new_df.columns if c in old_df.columns and c != key_column]:
+        mismatch = cell_mismatch(normalize_column(old_common[col]), normalize_column(new_common[col]))
+        for i in np.flatnonzero(mismatch):
+            old_value = _json_value(old_common[col].iloc[i])
+            new_value = _json_value(new_common[col].iloc[i])
+            changes.setdefault(common[i], {})[str(col)] = [old_value, new_value]
+
+    diff.modified = [{'key': key, 'changes': cols} for key, cols in changes.items()]
+    return diff
+
+
+class ChangeLog:
+    """Append-only per-source changelog of row-level deltas in JSON Lines format."""
+
+    def __init__(self, changelog_dir: str):
+        self.changelog_dir = changelog_dir
+        os.makedirs(changelog_dir, exist_ok=True)
+
+    def path(self, source: str) -> str:
+        return os.path.join(self.changelog_dir, f"{source}.jsonl")
+
+    def append(self, source: str, diff: RowDiff, timestamp: Optional[str] = None) -> int:
+        """Append the deltas of a diff to the source's changelog.
+
+        Returns the number of lines written.
+        """
+        if diff.is_empty:
+            return 0
+
+        timestamp = timestamp or datetime.now().isoformat()
+        lines = []
+        for change in diff.added:
+            lines.append({'timestamp': timestamp, 'op': 'added', 'key': change['key'], 'row': change['row']})
+        for change in diff.removed:
+            lines.append({'timestamp': timestamp, 'op': 'removed', 'key': change['key'], 'row': change['row']})
+        for change in diff.modified:
+            lines.append({'timestamp': timestamp, 'op': 'modified', 'key': change['key'], 'changes': change['changes']})
+
+        with open(self.path(source), 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(line, default=str) + '\n' for line in lines))
+        logger.info(f"Appended {len(lines)} changes to changelog for {source}: {diff.summary()}")
+        return len(lines)
+
+    def read(self, source: str, since: Optional[str] = None) -> List[Dict]:
+        """Read a source's changelog, optionally only entries at or after an ISO timestamp."""
+        path = self.path(source)
+        if not os.path.exists(path):
+            return []
+        entries = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if since is None or entry['timestamp'] >= since:
+                    entries.append(entry)
+        return entries
@@ -1,15 +1,27 @@
-from curl_cffi import AsyncSession, exceptions
-from bs4 import BeautifulSoup
-import pandas as pd
 from datetime import datetime
 import os
-from typing import Dict, List, Tuple
-import json
+from typing import Dict, List, Optional, Tuple
 import logging
 import asyncio
-from config.settings import BASE_URLS
-from urllib.parse import urljoin, urlparse
-import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config.settings import FETCH_CONCURRENCY, LOG_ROTATION, RETRY_CONFIG, LINK_EXTRACTION, INGESTION_WORKERS
+from utils.http_cache import ValidatorStore
+from utils.logstore import JsonLinesLog
+from utils.session_pool import get_session
+from utils.links import extract_links
+from utils.schema import SchemaRegistry
+from utils.sources import SOURCES, SourceRegistry
+from utils.instrumentation import RunTrace
+from utils.resilience import CircuitBreaker, check_status, retrying
+from utils.workers import IngestJob, IngestResult, ingest_file, init_worker
+from urllib.parse import urlparse
+import tempfile
+from contextlib import asynccontextmanager
+
+# Bytes between download progress events
+PROGRESS_BYTES = 1024 * 1024
 
 # Configure logging
 logging.basicConfig(
@@ -23,172 +35,206 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class LinkFetcher:
-    def __init__(self, headers: Dict, urls: Dict[str, List[str]], download_dir: str):
+    def __init__(self, headers: Dict, urls: Dict[str, List[str]], download_dir: str,
+                 max_concurrency: int = FETCH_CONCURRENCY["MAX_CONCURRENT_REQUESTS"],
+                 per_host_concurrency: int = FETCH_CONCURRENCY["MAX_REQUESTS_PER_HOST"],
+                 session=None, max_workers: Optional[int] = INGESTION_WORKERS["MAX_WORKERS"],
+                 sources: SourceRegistry = SOURCES):
         self.headers = headers
         self.urls = urls
+        self.sources = sources  # Dataset names and link rules of each provider page
         self.download_dir = download_dir
-        self.logs = []
-        self.log_file = os.path.join(os.path.dirname(download_dir), 'logs', 'fetch_history.json')
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.session = session  # Defaults to the pooled session of the running event loop
+        self.max_workers = max_workers  # Ingestion worker processes, 0 to parse in this process
+        self._executor = None
+        self._ingest_locks = {}  # One ingestion at a time per dataset
+        self.breaker = CircuitBreaker()
+        self.page_errors = {}  # Error message per provider page URL from the last fetch_links run
+        self.progress = None  # Called with each progress event dict during fetches, if set
+        self.log_file = os.path.join(os.path.dirname(download_dir), 'logs', 'fetch_history.jsonl')
+        self.validators = ValidatorStore(os.path.join(os.path.dirname(download_dir), 'cache', 'http_validators.json'))
+        self.changes = {}  # Row-level change summary per file name from the last download_files run
+        self.schemas = SchemaRegistry(os.path.join(os.path.dirname(download_dir), 'config', 'schemas.json'))
+        self.schema_drift = {}  # Schema drift per file name from the last download_files run
         
         # Create directories if they don't exist
         os.makedirs(download_dir, exist_ok=True)
         os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
         
-        # Load existing logs
-        if os.path.exists(self.log_file):
-            with open(self.log_file, 'r') as f:
-                self.logs = json.load(f)
+        # Append-only fetch history, importing the old JSON array log if present
+        self.history_log = JsonLinesLog(self.log_file, max_bytes=LOG_ROTATION["MAX_BYTES"], max_age_days=LOG_ROTATION["MAX_AGE_DAYS"])
+        self.history_log.migrate_from_json(os.path.join(os.path.dirname(self.log_file), 'fetch_history.json'))
+
+        # Per-stage timings of the current run, saved next to the fetch history
+        self.trace = RunTrace()
+        self.trace_log = JsonLinesLog(os.path.join(os.path.dirname(self.log_file), 'fetch_traces.jsonl'),
+                                      max_bytes=LOG_ROTATION["MAX_BYTES"], max_age_days=LOG_ROTATION["MAX_AGE_DAYS"])
         logger.info(f"LinkFetcher initialized with download directory: {download_dir}")
     
     def _get_file_name(self, url, country):
-        """Generate a standardized file name based on URL and country."""
-        if country == "NZ":
-            if "public-hospitals" in url:
-                return "NZ_Public_Hospitals"
-            elif "private-hospitals" in url:
-                return "NZ_Private_Hospitals"
-        elif country == "AU":
-            if "declared-hospitals" in url:
-                return "AU_Declared_Hospitals"
-        
-        # Fallback: Use URL parts
-        parsed = urlparse(url)
-        path_parts = parsed.path.split('/')
-        relevant_part = next((part for part in path_parts if 'hospital' in part), path_parts[-1])
-        return f"{country}_{relevant_part.replace('-', '_').title()}"
-
-    def _compare_data(self, new_df, existing_file):
-        """Compare new data with existing data."""
-        if not os.path.exists(existing_file):
-            logger.info(f"No existing file found at {existing_file}, will save new data.")
-            return False  # No existing file, save new data
-            
+        """Return the dataset name of a provider page URL."""
+        return self.sources.resolve(url, country).dataset
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        """Return the ingestion worker pool, starting it on first use (None if disabled)."""
+        if self.max_workers == 0:
+            return None
+        if self._executor is None:
+            # Spawned rather than forked, since the fetching process runs other threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+                initargs=(os.path.abspath(os.path.join('src', 'data', 'logs', 'fetcher.log')),)
+            )
+        return self._executor
+
+    async def _run_in_worker(self, func, *args):
+        """Run a CPU-bound function in the worker pool without blocking the event loop."""
+        executor = self._get_executor()
+        if executor is None:
+            return func(*args)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next job
+            self._executor = None
+            raise
+
+    def close(self):
+        """Shut down the ingestion worker pool."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _emit(self, event: str, **fields):
+        """Report a progress event ('page', 'download' or 'file') to the progress callback."""
+        if self.progress is None:
+            return
         try:
-            # Load existing data
-            existing_df = pd.read_csv(existing_file)
-            
-            # Debug info
-            logger.debug(f"Existing data shape: {existing_df.shape}, New data shape: {new_df.shape}")
-            
-            # Basic size check
-            if len(existing_df) != len(new_df):
-                logger.info(f"Row count mismatch: Existing {len(existing_df)}, New {len(new_df)}")
-                return False
-                
-            # Make copies to avoid modifying originals
-            existing_df_copy = existing_df.copy()
-            new_df_copy = new_df.copy()
-            
-            # Reset indexes
-            existing_df_copy.reset_index(drop=True, inplace=True)
-            new_df_copy.reset_index(drop=True, inplace=True)
-            
-            # Make sure we can compare apples to apples
-            if existing_df_copy.shape[1] != new_df_copy.shape[1]:
-                logger.info(f"Column count mismatch: Existing {existing_df_copy.shape[1]}, New {new_df_copy.shape[1]}")
-                return False
-                
-            # Process all columns in both dataframes to make them comparable
-            for i, df in enumerate([existing_df_copy, new_df_copy]):
-                df_name = "Existing" if i == 0 else "New"
-                # Convert all columns to string to handle type differences
-                for col in df.columns:
-                    # Handle different data types appropriately
-                    if pd.api.types.is_numeric_dtype(df[col]):
-                        # For numeric, format to fixed precision to avoid float comparison issues
-                        logger.debug(f"Converting numeric column {col} in {df_name} df")
-                        df[col] = df[col].apply(lambda x: f"{float(x):.5f}" if pd.notnull(x) else "")
-                    elif pd.api.types.is_datetime64_any_dtype(df[col]):
-                        # For dates, convert to ISO format string
-                        logger.debug(f"Converting datetime column {col} in {df_name} df")
-                        df[col] = df[col].astype(str).str.replace('NaT', '')
-                    else:
-                        # For strings and other types, convert to string and strip whitespace
-                        logger.debug(f"Converting column {col} in {df_name} df to string")
-                        df[col] = df[col].astype(str).str.strip().str.replace('nan', '')
-            
-            # Simple check - if the processed dataframes have identical row counts and values
-            # we consider them the same regardless of column names
-            
-            # Extract values as lists (easier to debug than numpy arrays)
-            existing_values = existing_df_copy.values.tolist()
-            new_values = new_df_copy.values.tolist()
-            
-            # Check for equality
-            is_equal = True
-            for i, (existing_row, new_row) in enumerate(zip(existing_values, new_values)):
-                if existing_row != new_row:
-                    is_equal = False
-                    logger.debug(f"Difference in row {i}:")
-                    logger.debug(f"  Existing: {existing_row}")
-                    logger.debug(f"  New:      {new_row}")
-                    # Only show a few differences to avoid log spam
-                    if i >= 2:
-                        logger.debug("More differences exist but not showing all...")
-                        break
-            
-            logger.info(f"Final comparison result: {'EQUAL' if is_equal else 'DIFFERENT'}")
-            return is_equal
-            
+            self.progress({'event': event, 'timestamp': datetime.now().isoformat(), **fields})
         except Exception as e:
-            logger.warning(f"Error comparing data: {str(e)}")
-            import traceback
-            logger.warning(traceback.format_exc())
-            return False
-
-    def _save_file(self, df, file_name):
-        """Save DataFrame to file with comparison."""
-        file_path = os.path.join(self.download_dir, f"{file_name}.csv")
-        
-        # Compare with existing data
-        is_same = self._compare_data(df, file_path)
-        if is_same:
-            logger.info(f"Data unchanged for {file_name} - skipping save")
-            return False
-        
-        # Save new data
-        df.to_csv(file_path, index=False)
-        logger.info(f"Saved new data to {file_name}")
-        return True
+            logger.warning(f"Progress callback failed: {str(e)}")
+
+    def begin_trace(self):
+        """Start timing a new run."""
+        self.trace = RunTrace()
+
+    def end_trace(self) -> Dict:
+        """Save the current run's trace to the trace log and start a new one.
+
+        Returns the saved trace entry.
+        """
+        entry = self.trace.to_entry()
+        self.trace_log.append(entry)
+        self.trace = RunTrace()
+        return entry
+
+    def _create_limiter(self):
+        """Create a request limiter enforcing the global and per-host concurrency limits."""
+        global_semaphore = asyncio.Semaphore(self.max_concurrency)
+        host_semaphores = {}
+
+        @asynccontextmanager
+        async def limit(url):
+            host = urlparse(url).netloc
+            if host not in host_semaphores:
+                host_semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+            async with host_semaphores[host], global_semaphore:
+                yield
+
+        return limit
+
+    async def _fetch_page_links(self, session, limit, url):
+        """Fetch a single provider page and extract its data file links.
+
+        Pages that answer 304 Not Modified reuse the links extracted last time.
+        Returns the list of links, or None if the page could not be fetched.
+        """
+        host = urlparse(url).netloc
+        if not self.breaker.allow(host):
+            self.page_errors[url] = f"Skipped: circuit open for {host}"
+            logging.warning(f"Skipping {url}: circuit open for {host}")
+            return None
+
+        cached = self.validators.get(url)
+        request_headers = dict(self.headers)
+        if 'links' in cached:
+            request_headers.update(self.validators.conditional_headers(url))
+
+        try:
+            async for attempt in retrying():
+                with attempt:
+                    async with limit(url):
+                        with self.trace.stage('page_fetch', url) as span:
+                            response = await session.get(url, headers=request_headers, impersonate="chrome131",
+                                                         timeout=RETRY_CONFIG["PAGE_TIMEOUT_SECONDS"])
+                            span.update(status=response.status_code, bytes=len(response.content))
+                    check_status(url, response.status_code)
+        except Exception as e:
+            self.breaker.record_failure(host)
+            self.page_errors[url] = str(e)
+            logging.error(f"Error fetching {url}: {str(e)}")
+            return None
+        self.breaker.record_success(host)
+
+        try:
+            if response.status_code == 304 and 'links' in cached:
+                logger.info(f"Page not modified, reusing cached links for {url}")
+                self.validators.touch(url)
+                return cached['links']
+            if response.status_code != 200:
+                self.page_errors[url] = f"Status {response.status_code}"
+                logging.error(f"Failed to fetch {url}: Status {response.status_code}")
+                return None
+
+            # Find links to CSV or Excel files, only within the page's configured scope
+            rules = self.sources.resolve(url).link_rules
+            with self.trace.stage('html_parse', url) as span:
+                links = await self._run_in_worker(extract_links, response.text, url, rules.get("scope"),
+                                                  rules.get("expected_links"), LINK_EXTRACTION["PARSER"])
+                span['links'] = len(links)
+
+            self.validators.update(url, response.headers, links=links)
+            return links
+        except Exception as e:
+            self.page_errors[url] = str(e)
+            logging.error(f"Error fetching {url}: {str(e)}")
+            return None
 
     async def fetch_links(self):
-        """Fetch links from all configured URLs."""
-        results = {}
+        """Fetch links from all configured URLs concurrently."""
+        results = {country: [] for country in self.urls}
         total_attempts = 0
         successful = 0
         failed = 0
 
-        async with AsyncSession() as session:
-            for country, urls in self.urls.items():
-                results[country] = []
-                for url in urls:
-                    try:
-                        response = await session.get(url, headers=self.headers, impersonate="chrome131")
-                        if response.status_code == 200:
-                            soup = BeautifulSoup(response.text, 'html.parser')
-                            
-                            # Find all links that might be CSV or Excel files
-                            links = []
-                            for link in soup.find_all('a'):
-                                href = link.get('href', '')
-                                if any(ext in href.lower() for ext in ['.csv', '.xlsx', '.xls']):
-                                    full_url = urljoin(url, href)
-                                    links.append({
-                                        'url': full_url,
-                                        'base_url': url,
-                                        'text': link.get_text(strip=True)
-                                    })
-                            
-                            results[country].extend(links)
-                            successful += len(links)
-                        else:
-                            failed += 1
-                            logging.error(f"Failed to fetch {url}: Status {response.status_code}")
-                    except Exception as e:
-                        failed += 1
-                        logging.error(f"Error fetching {url}: {str(e)}")
-                    
-                    total_attempts += 1
+        pages = [(country, url) for country, urls in self.urls.items() for url in urls]
+        limit = self._create_limiter()
+        self.page_errors = {}
+
+        session = self.session or get_session()
+
+        async def fetch_page(country, url):
+            links = await self._fetch_page_links(session, limit, url)
+            self._emit('page', url=url, source=self.sources.resolve(url, country).id,
+                       links=len(links) if links is not None else None, error=self.page_errors.get(url))
+            return links
+
+        page_links = await asyncio.gather(*(fetch_page(country, url) for country, url in pages))
+
+        # Merge in configuration order so results keep the {country: [links]} shape
+        for (country, url), links in zip(pages, page_links):
+            total_attempts += 1
+            if links is None:
+                failed += 1
+            else:
+                results[country].extend(links)
+                successful += len(links)
+
+        self.validators.save()
 
         # Log the fetch operation
         log_entry = {
@@ -197,52 +243,138 @@ class LinkFetcher:
             'successful': successful,
             'failed': failed
         }
-        self.logs.append(log_entry)
-        
-        # Save logs
-        with open(self.log_file, 'w') as f:
-            json.dump(self.logs, f)
+        self.history_log.append(log_entry)
 
         return results, log_entry
 
+    async def _stream_to_file(self, session, url, headers, temp_path):
+        """Stream one download attempt into temp_path in chunks.
+
+        Returns the (status_code, response_headers) of the response.
+        """
+        with open(temp_path, 'wb') as f:
+            async with session.stream("GET", url, headers=headers, impersonate="chrome131",
+                                      timeout=RETRY_CONFIG["DOWNLOAD_TIMEOUT_SECONDS"]) as response:
+                check_status(url, response.status_code)
+                if response.status_code == 200:
+                    total = response.headers.get('content-length')
+                    total = int(total) if total else None
+                    received = reported = 0
+                    async for chunk in response.aiter_content():
+                        f.write(chunk)
+                        received += len(chunk)
+                        if received - reported >= PROGRESS_BYTES:
+                            self._emit('download', url=url, bytes=received, total_bytes=total)
+                            reported = received
+                return response.status_code, response.headers
+
+    async def _download_to_temp_file(self, session, limit, url, headers):
+        """Stream a file download to a temporary file on disk, retrying transient failures.
+
+        Returns a (status_code, response_headers, temp_path) tuple. temp_path is
+        None unless the full body was downloaded.
+        """
+        host = urlparse(url).netloc
+        if not self.breaker.allow(host):
+            logging.warning(f"Skipping {url}: circuit open for {host}")
+            return None, {}, None
+
+        suffix = os.path.splitext(urlparse(url).path)[1]
+        fd, temp_path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        status_code = None
+        response_headers = {}
+        try:
+            async for attempt in retrying():
+                with attempt:
+                    async with limit(url):
+                        with self.trace.stage('download', url) as span:
+                            status_code, response_headers = await self._stream_to_file(session, url, headers, temp_path)
+                            span.update(status=status_code, bytes=os.path.getsize(temp_path))
+            self.breaker.record_success(host)
+            if status_code not in (200, 304):
+                logging.error(f"Failed to download {url}: Status {status_code}")
+        except Exception as e:
+            self.breaker.record_failure(host)
+            status_code = None
+            logging.error(f"Error downloading {url}: {str(e)}")
+
+        if status_code != 200:
+            os.remove(temp_path)
+            temp_path = None
+        return status_code, response_headers, temp_path
+
+    async def _download_file(self, session, limit, link, country):
+        """Download a single data file and save it if its data changed.
+
+        Files that answer 304 Not Modified are skipped without parsing.
+        Returns the saved file name, or None if nothing was saved.
+        """
+        url = link['url']
+
+        # Generate file name
+        file_name = self._get_file_name(link['base_url'], country)
+
+        # Only revalidate if we still have the data the validators describe
+        request_headers = dict(self.headers)
+        if os.path.exists(os.path.join(self.download_dir, f"{file_name}.csv")):
+            request_headers.update(self.validators.conditional_headers(url))
+
+        status_code, response_headers, temp_path = await self._download_to_temp_file(session, limit, url, request_headers)
+        if status_code == 304:
+            logger.info(f"File not modified, skipping download: {url}")
+            self.validators.touch(url)
+            self._emit('file', url=url, dataset=file_name, status='not_modified')
+            return None
+        if temp_path is None:
+            self._emit('file', url=url, dataset=file_name, status='failed',
+                       error=f"Status {status_code}" if status_code else "Download failed")
+            return None
+        size = os.path.getsize(temp_path)
+
+        try:
+            # Parse, compare and save in a worker process, one file per dataset at a time
+            async with self._ingest_locks.setdefault(file_name, asyncio.Lock()):
+                result = await self._run_in_worker(ingest_file, IngestJob(temp_path, file_name, self.download_dir))
+        except Exception as e:
+            result = IngestResult(file_name, error=str(e))
+        finally:
+            os.remove(temp_path)
+
+        self.trace.spans.extend(result.spans)
+        if result.error is not None:
+            logging.error(f"Error processing file from {url}: {result.error}")
+            self._emit('file', url=url, dataset=file_name, status='failed', bytes=size, error=result.error)
+            return None
+
+        if result.drift:
+            self.schema_drift[file_name] = result.drift
+        if result.changes:
+            self.changes[file_name] = result.changes
+        self.schemas.register_schema(file_name, result.schema)
+        self.validators.update(url, response_headers, file_name=file_name)
+        self._emit('file', url=url, dataset=file_name, status='saved' if result.saved else 'unchanged', bytes=size)
+        return file_name if result.saved else None
+
     async def download_files(self, results):
-        """Download files from the fetched links."""
-        downloaded = {}
-        
-        async with AsyncSession() as session:
-            for country, links in results.items():
-                downloaded[country] = []
-                for link in links:
-                    try:
-                        response = await session.get(link['url'], headers=self.headers, impersonate="chrome131")
-                        if response.status_code == 200:
-                            content = response.content
-                            
-                            # Convert to DataFrame based on file type
-                            try:
-                                if link['url'].endswith('.csv'):
-                                    df = pd.read_csv(io.BytesIO(content))
-                                else:  # Excel
-                                    df = pd.read_excel(io.BytesIO(content))
-                                
-                                # Generate file name
-                                file_name = self._get_file_name(link['base_url'], country)
-                                
-                                # Save file with comparison
-                                if self._save_file(df, file_name):
-                                    downloaded[country].append(file_name)
-                                    
-                            except Exception as e:
-                                logging.error(f"Error processing file from {link['url']}: {str(e)}")
-                        else:
-                            logging.error(f"Failed to download {link['url']}: Status {response.status_code}")
-                    except Exception as e:
-                        logging.error(f"Error downloading {link['url']}: {str(e)}")
+        """Download files from the fetched links concurrently."""
+        downloaded = {country: [] for country in results}
+        self.changes = {}
+        self.schema_drift = {}
+        self._ingest_locks = {}
 
-        return downloaded
+        files = [(country, link) for country, links in results.items() for link in links]
+        limit = self._create_limiter()
+
+        session = self.session or get_session()
+        saved = await asyncio.gather(
+            *(self._download_file(session, limit, link, country) for country, link in files)
+        )
 
-    def _save_logs(self):
-        """Save logs to file."""
-        with open(self.log_file, 'w') as f:
-            json.dump(self.logs, f, indent=4)
-            logger.debug("Fetch history saved to file") 
\ No newline at end of file
+        for (country, _), file_name in zip(files, saved):
+            if file_name:
+                downloaded[country].append(file_name)
+
+        self.validators.save()
+
+        return downloaded
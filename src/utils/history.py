@@ -0,0 +1,154 @@
+import logging
+import os
+import sqlite3
+from contextlib import closing
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fetch_status (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    country TEXT,
+    source TEXT,
+    url TEXT,
+    status TEXT,
+    data_updated INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_fetch_status_timestamp ON fetch_status (timestamp);
+CREATE INDEX IF NOT EXISTS idx_fetch_status_country ON fetch_status (country);
+CREATE INDEX IF NOT EXISTS idx_fetch_status_url ON fetch_status (url);
+CREATE INDEX IF NOT EXISTS idx_fetch_status_status ON fetch_status (status);
+"""
+
+# Columns added after the first release, created on stores that predate them
+MIGRATIONS = {
+    'source': "ALTER TABLE fetch_status ADD COLUMN source TEXT",
+}
+SOURCE_INDEX = "CREATE INDEX IF NOT EXISTS idx_fetch_status_source ON fetch_status (source)"
+
+STATUSES = ['success', 'failed', 'error']
+
+
+class FetchHistoryStore:
+    """Indexed SQLite store of per-URL fetch status entries for analytics queries."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(SCHEMA)
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(fetch_status)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+            conn.execute(SOURCE_INDEX)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def record_many(self, entries: Iterable[Dict]):
+        """Insert fetch status entries in one transaction."""
+        rows = [
+            (e['timestamp'], e.get('country'), e.get('source'), e.get('url'), e.get('status'),
+             int(bool(e.get('data_updated', False))), e.get('error'))
+            for e in entries
+        ]
+        if not rows:
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT INTO fetch_status (timestamp, country, source, url, status, data_updated, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def record(self, entry: Dict):
+        """Insert a single fetch status entry."""
+        self.record_many([entry])
+
+    def is_empty(self) -> bool:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT 1 FROM fetch_status LIMIT 1").fetchone() is None
+
+    def backfill(self, entries: Iterable[Dict]):
+        """Import existing log entries if the store has never been populated."""
+        if self.is_empty():
+            entries = list(entries)
+            self.record_many(entries)
+            if entries:
+                logger.info(f"Backfilled {len(entries)} entries into {self.db_path}")
+
+    def latest(self, n: int = 10, country: Optional[str] = None, url: Optional[str] = None,
+               source: Optional[str] = None) -> List[Dict]:
+        """Return the latest ``n`` entries, newest first."""
+        query = "SELECT timestamp, country, source, url, status, data_updated, error FROM fetch_status"
+        conditions, params = [], []
+        if country is not None:
+            conditions.append("country = ?")
+            params.append(country)
+        if source is not None:
+            conditions.append("source = ?")
+            params.append(source)
+        if url is not None:
+            conditions.append("url = ?")
+            params.append(url)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY timestamp DESC LIMIT ?"
+        params.append(n)
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [{**dict(row), 'data_updated': bool(row['data_updated'])} for row in rows]
+
+    def status_totals(self, since: Optional[str] = None) -> Dict[str, int]:
+        """Count entries per status, optionally from an ISO timestamp onwards."""
+        query = "SELECT status, COUNT(*) AS n FROM fetch_status"
+        params = []
+        if since is not None:
+            query += " WHERE timestamp >= ?"
+            params.append(since)
+        query += " GROUP BY status"
+
+        with closing(self._connect()) as conn:
+            totals = {row['status']: row['n'] for row in conn.execute(query, params)}
+        for status in STATUSES:
+            totals.setdefault(status, 0)
+        totals['total'] = sum(n for status, n in totals.items() if status != 'total')
+        return totals
+
+    def daily_status_counts(self, since: Optional[str] = None, until: Optional[str] = None) -> pd.DataFrame:
+        """Count entries per day and status, with the daily success rate."""
+        query = (
+            "SELECT substr(timestamp, 1, 10) AS date, "
+            "SUM(status = 'success') AS success, "
+            "SUM(status = 'failed') AS failed, "
+            "SUM(status = 'error') AS error "
+            "FROM fetch_status"
+        )
+        conditions, params = [], []
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("timestamp < ?")
+            params.append(until)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " GROUP BY date ORDER BY date"
+
+        with closing(self._connect()) as conn:
+            status_counts = pd.read_sql_query(query, conn)
+
+        status_counts['date'] = pd.to_datetime(status_counts['date']).dt.date
+        total = status_counts['success'] + status_counts['failed'] + status_counts['error']
+        status_counts['success_rate'] = status_counts['success'] / total * 100
+        return status_counts
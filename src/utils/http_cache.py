@@ -0,0 +1,79 @@
+import logging
+import os
+from datetime import datetime
+from typing import Dict
+
+from utils.statefile import read_json, write_json
+
+logger = logging.getLogger(__name__)
+
+
+class ValidatorStore:
+    """Persistent store of HTTP cache validators (ETag / Last-Modified) keyed by URL."""
+
+    def __init__(self, cache_file: str):
+        self.cache_file = cache_file
+        self.entries = {}
+        self._dirty = False
+
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+
+        # Load existing validators
+        try:
+            self.entries = read_json(cache_file, {})
+        except Exception as e:
+            logger.warning(f"Could not load HTTP validator cache, starting empty: {str(e)}")
+            self.entries = {}
+
+    def get(self, url: str) -> Dict:
+        """Return the stored entry for a URL, or an empty dict."""
+        return self.entries.get(url, {})
+
+    def conditional_headers(self, url: str) -> Dict:
+        """Build If-None-Match / If-Modified-Since headers for a URL."""
+        entry = self.get(url)
+        headers = {}
+        if entry.get('etag'):
+            headers['if-none-match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['if-modified-since'] = entry['last_modified']
+        return headers
+
+    def update(self, url: str, response_headers, **extra):
+        """Store the validators from a successful response, plus any extra fields."""
+        etag = response_headers.get('etag')
+        last_modified = response_headers.get('last-modified')
+        if not etag and not last_modified:
+            # Nothing to revalidate against next time
+            self.invalidate(url)
+            return
+
+        content_length = response_headers.get('content-length')
+        entry = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_length': int(content_length) if content_length else None,
+            'checked_at': datetime.now().isoformat()
+        }
+        entry.update(extra)
+        self.entries[url] = entry
+        self._dirty = True
+
+    def touch(self, url: str):
+        """Record that a URL was revalidated without changes."""
+        if url in self.entries:
+            self.entries[url]['checked_at'] = datetime.now().isoformat()
+            self._dirty = True
+
+    def invalidate(self, url: str):
+        """Forget the validators for a URL."""
+        if self.entries.pop(url, None) is not None:
+            self._dirty = True
+
+    def save(self):
+        """Write the validators to disk if anything changed."""
+        if not self._dirty:
+            return
+        write_json(self.cache_file, self.entries)
+        self._dirty = False
+        logger.debug("HTTP validator cache saved to file")
@@ -0,0 +1,64 @@
+import logging
+import os
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from utils.sources import SOURCES
+
+try:
+    import python_calamine  # noqa: F401 - only checked for, pandas loads it as engine='calamine'
+    CALAMINE_AVAILABLE = True
+except ImportError:  # calamine is optional, openpyxl is used without it
+    CALAMINE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+
+# Used for any setting a dataset's spec does not override
+DEFAULT_SPEC = {
+    "engine": "auto",
+    "sheet": 0,
+    "header": 0,
+    "usecols": None,
+    "dtypes": None,
+}
+
+
+def ingestion_spec(file_name: Optional[str]) -> Dict:
+    """Return the ingestion spec of a dataset's source, filled in with the defaults."""
+    source = SOURCES.by_dataset(file_name) if file_name else None
+    return {**DEFAULT_SPEC, **(source.ingestion if source else {})}
+
+
+def excel_engine(engine: str) -> str:
+    """Resolve a spec's engine setting to a pandas read_excel engine."""
+    if engine == 'auto':
+        return 'calamine' if CALAMINE_AVAILABLE else 'openpyxl'
+    if engine == 'calamine' and not CALAMINE_AVAILABLE:
+        logger.warning("python-calamine is not installed, reading Excel files with openpyxl")
+        return 'openpyxl'
+    return engine
+
+
+def read_source_file(path: str, file_name: Optional[str] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Parse a downloaded source file following its dataset's ingestion spec.
+
+    Only the configured sheet and columns are parsed, with the configured
+    dtypes. ``columns`` further narrows the columns read. Files ending in .csv
+    are read as CSV, anything else as a workbook.
+    """
+    spec = ingestion_spec(file_name)
+    usecols = columns if columns is not None else spec['usecols']
+
+    if path.lower().endswith('.csv'):
+        return pd.read_csv(path, header=spec['header'], usecols=usecols, dtype=spec['dtypes'])
+
+    engine = excel_engine(spec['engine'])
+    # openpyxl cannot read the old binary format
+    if engine == 'openpyxl' and path.lower().endswith('.xls'):
+        engine = None
+    logger.debug(f"Reading {os.path.basename(path)} with engine {engine or 'default'}, sheet {spec['sheet']!r}")
+    return pd.read_excel(path, engine=engine, sheet_name=spec['sheet'], header=spec['header'],
+                         usecols=usecols, dtype=spec['dtypes'])
@@ -0,0 +1,176 @@
+import cProfile
+import functools
+import inspect
+import io
+import logging
+import os
+import pstats
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyinstrument
+except ImportError:  # pyinstrument is optional, cProfile is always available
+    pyinstrument = None
+
+logger = logging.getLogger(__name__)
+
+# Stages of a fetch run, in pipeline order
+STAGES = ('page_fetch', 'html_parse', 'download', 'file_parse', 'digest', 'compare',
+          'changelog', 'csv_write', 'snapshot_write')
+
+PROFILERS = ('cprofile', 'pyinstrument')
+
+
+class RunTrace:
+    """Timings and counters for the stages of one fetch run.
+
+    Each timed block adds a span: {'stage', 'source', 'seconds', ...counters}.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self.spans: List[Dict] = []
+
+    @contextmanager
+    def stage(self, name: str, source: Optional[str] = None, **counters):
+        """Time a block. The yielded span dict can be given counters such as bytes or rows."""
+        span = {'stage': name, 'source': source, **counters}
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span['seconds'] = time.perf_counter() - start
+            self.spans.append(span)
+
+    def summary(self) -> Dict[str, Dict]:
+        """Aggregate the spans per stage: count, total, p50, p95 and max seconds, bytes and rows."""
+        by_stage: Dict[str, List[Dict]] = {}
+        for span in self.spans:
+            by_stage.setdefault(span['stage'], []).append(span)
+
+        summary = {}
+        for stage, spans in by_stage.items():
+            seconds = np.array([span['seconds'] for span in spans])
+            summary[stage] = {
+                'count': len(spans),
+                'total_seconds': float(seconds.sum()),
+                'p50_seconds': float(np.percentile(seconds, 50)),
+                'p95_seconds': float(np.percentile(seconds, 95)),
+                'max_seconds': float(seconds.max()),
+                'bytes': sum(span.get('bytes', 0) for span in spans),
+                'rows': sum(span.get('rows', 0) for span in spans)
+            }
+        return summary
+
+    def to_entry(self) -> Dict:
+        """Build the trace log entry for this run."""
+        return {
+            'timestamp': self.started_at.isoformat(),
+            'duration_seconds': time.perf_counter() - self._start,
+            'stages': self.summary(),
+            'spans': self.spans
+        }
+
+
+def timed(stage: str):
+    """Decorator timing a method (sync or async) as a stage of ``self.trace``."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                with self.trace.stage(stage):
+                    return await func(self, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.trace.stage(stage):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def profile_capture(profiler: Optional[str], output_dir: str):
+    """Profile the enclosed block with cProfile or pyinstrument and save the report.
+
+    With profiler=None this does nothing. cProfile writes a .prof file (for
+    snakeviz or pstats) plus a text summary; pyinstrument writes an HTML report.
+    Only the calling thread is profiled.
+    """
+    if profiler is None:
+        yield None
+        return
+    if profiler not in PROFILERS:
+        raise ValueError(f"Unknown profiler: {profiler}")
+    if profiler == 'pyinstrument' and pyinstrument is None:
+        logger.warning("pyinstrument is not installed, profiling with cProfile instead")
+        profiler = 'cprofile'
+
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, f"fetch_{datetime.now().strftime('%Y%m%dT%H%M%S')}")
+
+    if profiler == 'pyinstrument':
+        # Async mode follows the awaited coroutine rather than the thread
+        profile = pyinstrument.Profiler(async_mode='enabled')
+        profile.start()
+        try:
+            yield f"{base}.html"
+        finally:
+            profile.stop()
+            with open(f"{base}.html", 'w', encoding='utf-8') as f:
+                f.write(profile.output_html())
+            logger.info(f"Saved profile to {base}.html")
+        return
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield f"{base}.prof"
+    finally:
+        profile.disable()
+        profile.dump_stats(f"{base}.prof")
+        report = io.StringIO()
+        pstats.Stats(profile, stream=report).sort_stats('cumulative').print_stats(40)
+        with open(f"{base}.txt", 'w', encoding='utf-8') as f:
+            f.write(report.getvalue())
+        logger.info(f"Saved profile to {base}.prof")
+
+
+def stage_percentiles(entries: Iterable[Dict]) -> pd.DataFrame:
+    """Flatten trace log entries into one row per run and stage.
+
+    Columns: timestamp, stage, count, p50_seconds, p95_seconds, max_seconds, bytes, rows.
+    """
+    rows = [
+        {'timestamp': entry['timestamp'], 'stage': stage, **stats}
+        for entry in entries
+        for stage, stats in entry.get('stages', {}).items()
+    ]
+    if not rows:
+        return pd.DataFrame(columns=['timestamp', 'stage', 'count', 'p50_seconds', 'p95_seconds',
+                                     'max_seconds', 'bytes', 'rows'])
+    df = pd.DataFrame(rows)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df
+
+
+def span_percentiles(entries: Iterable[Dict], percentiles=(50, 90, 99)) -> pd.DataFrame:
+    """Latency percentiles of every span across runs, one row per stage."""
+    spans = pd.DataFrame([span for entry in entries for span in entry.get('spans', [])])
+    if spans.empty:
+        return pd.DataFrame()
+    grouped = spans.groupby('stage')['seconds']
+    result = pd.DataFrame({f"p{p}_seconds": grouped.quantile(p / 100) for p in percentiles})
+    result.insert(0, 'count', grouped.size())
+    # Keep pipeline order
+    order = [stage for stage in STAGES if stage in result.index] + \
+            [stage for stage in result.index if stage not in STAGES]
+    return result.loc[order]
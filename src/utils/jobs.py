@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from utils.session_pool import get_shared_loop
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept for viewers to look up
+MAX_FINISHED_JOBS = 20
+
+
+@dataclass
+class FetchJob:
+    """A fetch running in the background, with the progress events it has reported so far."""
+    id: str
+    urls: Dict[str, List[str]]
+    profiler: Optional[str] = None
+    state: str = 'queued'  # queued, running, done or failed
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    result: Optional[Dict] = None  # {'stats', 'files_downloaded'} once done
+    error: Optional[str] = None
+    events: List[Dict] = field(default_factory=list)
+
+    def start(self):
+        self.state = 'running'
+        self.started_at = datetime.now().isoformat()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ('done', 'failed')
+
+    def add_event(self, event: Dict):
+        # Appending is atomic, so viewers can read the list while the job runs
+        self.events.append(event)
+
+    def progress(self) -> Dict:
+        """Summarize the events: pages and files done, and bytes downloaded."""
+        events = list(self.events)
+        downloading = {}
+        for event in events:
+            if event['event'] == 'download':
+                downloading[event['url']] = event['bytes']
+            elif event['event'] == 'file':
+                downloading[event['url']] = event.get('bytes', 0)
+        return {
+            'pages_total': sum(len(urls) for urls in self.urls.values()),
+            'pages_done': sum(1 for event in events if event['event'] == 'page'),
+            'links': sum(event['links'] or 0 for event in events if event['event'] == 'page'),
+            'files_done': sum(1 for event in events if event['event'] == 'file'),
+            'bytes': sum(downloading.values())
+        }
+
+
+class JobRunner:
+    """Runs fetch jobs as tasks on the shared event loop, outside any browser session.
+
+    ``run`` performs a job's fetch and returns (results, stats,
+    files_downloaded). It calls ``job.start()`` when the fetch begins (jobs
+    wait queued until then) and reports progress with ``job.add_event``.
+    A job keeps running when the session that started it goes away, and any
+    session can look it up by id to follow it.
+    """
+
+    def __init__(self, run: Callable[[FetchJob], Awaitable]):
+        self._run = run
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, urls: Dict[str, List[str]], profiler: Optional[str] = None) -> FetchJob:
+        """Start a fetch job in the background and return it.
+
+        If a job for the same URLs is already queued or running, that job is
+        returned instead of starting a duplicate.
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if not job.finished and job.urls == urls:
+                    logger.info(f"Joining fetch job {job.id} for the same sources")
+                    return job
+            job = FetchJob(id=uuid.uuid4().hex[:12], urls=urls, profiler=profiler)
+            self._jobs[job.id] = job
+            self._prune()
+        asyncio.run_coroutine_threadsafe(self._execute(job), get_shared_loop())
+        logger.info(f"Submitted fetch job {job.id} for {sum(len(u) for u in urls.values())} sources")
+        return job
+
+    async def _execute(self, job: FetchJob):
+        state = 'failed'
+        try:
+            _, stats, files_downloaded = await self._run(job)
+            job.result = {'stats': stats, 'files_downloaded': files_downloaded}
+            state = 'done'
+        except Exception as e:
+            logger.error(f"Fetch job {job.id} failed: {str(e)}")
+            job.error = str(e)
+        except BaseException:
+            # Cancelled, e.g. when the shared loop shuts down
+            logger.warning(f"Fetch job {job.id} was interrupted")
+            job.error = "Fetch was interrupted"
+            raise
+        finally:
+            # Finish the job whatever happened, so viewers never wait on it forever
+            job.finished_at = datetime.now().isoformat()
+            job.state = state
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: Optional[str]) -> Optional[FetchJob]:
+        return self._jobs.get(job_id) if job_id else None
+
+    def active(self) -> List[FetchJob]:
+        """Return the queued and running jobs, oldest first."""
+        with self._lock:
+            return [job for job in self._jobs.values() if not job.finished]
@@ -0,0 +1,199 @@
+import logging
+import re
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+try:
+    from lxml import etree
+except ImportError:  # lxml is optional, the standard library parser is used without it
+    etree = None
+
+logger = logging.getLogger(__name__)
+
+# File extensions that mark a link as a data file download
+DATA_FILE_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+# Pages are fed to the parser in chunks so extraction can stop before the end of the page
+CHUNK_SIZE = 64 * 1024
+
+_SELECTOR_PATTERN = re.compile(r'^(?P<tag>[a-zA-Z][\w-]*)?(?:#(?P<id>[\w-]+))?(?:\.(?P<cls>[\w-]+))?$')
+
+
+class _StopParsing(Exception):
+    """Raised by the collector once there are no more links to collect."""
+
+
+def parse_selector(selector: str) -> Dict:
+    """Parse a simple scope selector: ``tag``, ``#id``, ``.class``, ``tag#id`` or ``tag.class``."""
+    match = _SELECTOR_PATTERN.match(selector.strip())
+    if not match or not any(match.groupdict().values()):
+        raise ValueError(f"Unsupported scope selector: {selector!r}")
+    return {k: v for k, v in match.groupdict().items() if v}
+
+
+class _LinkCollector:
+    """Collects data file links from parser events, optionally only inside a scope element.
+
+    Only the first element matching the scope is searched; parsing stops
+    when it closes.
+    """
+
+    def __init__(self, base_url: str, scope: Optional[str] = None, expected_links: Optional[int] = None):
+        self.base_url = base_url
+        self.selector = parse_selector(scope) if scope else None
+        self.expected_links = expected_links
+        self.links: List[Dict] = []
+        self.scope_matched = False
+        self._scope_tag = None
+        self._scope_depth = 0
+        self._anchor_href = None
+        self._anchor_text: List[str] = []
+
+    @property
+    def in_scope(self) -> bool:
+        return self.selector is None or self._scope_depth > 0
+
+    @property
+    def in_anchor(self) -> bool:
+        return self._anchor_href is not None
+
+    def _matches(self, tag: str, attrs: Dict) -> bool:
+        if 'tag' in self.selector and tag != self.selector['tag']:
+            return False
+        if 'id' in self.selector and attrs.get('id') != self.selector['id']:
+            return False
+        if 'cls' in self.selector and self.selector['cls'] not in (attrs.get('class') or '').split():
+            return False
+        return True
+
+    def start(self, tag: str, attrs: Dict):
+        if self.selector is not None:
+            if self._scope_depth > 0:
+                if tag == self._scope_tag:
+                    self._scope_depth += 1
+            elif self._matches(tag, attrs):
+                self.scope_matched = True
+                self._scope_tag = tag
+                self._scope_depth = 1
+
+        if tag == 'a' and self.in_scope:
+            href = attrs.get('href') or ''
+            if any(ext in href.lower() for ext in DATA_FILE_EXTENSIONS):
+                self._anchor_href = href
+                self._anchor_text = []
+
+    def data(self, text: str):
+        if self.in_anchor:
+            self._anchor_text.append(text)
+
+    def end(self, tag: str, text: Optional[str] = None):
+        if tag == 'a' and self.in_anchor:
+            if text is not None:
+                self._anchor_text = [text]
+            self.links.append({
+                'url': urljoin(self.base_url, self._anchor_href),
+                'base_url': self.base_url,
+                'text': ''.join(part.strip() for part in self._anchor_text)
+            })
+            self._anchor_href = None
+            self._anchor_text = []
+            if self.expected_links and len(self.links) >= self.expected_links:
+                raise _StopParsing()
+
+        if self._scope_depth > 0 and tag == self._scope_tag:
+            self._scope_depth -= 1
+            if self._scope_depth == 0:
+                raise _StopParsing()
+
+
+class _StreamingParser(HTMLParser):
+    """Standard library SAX-style parser that forwards events to a collector."""
+
+    def __init__(self, collector: _LinkCollector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, dict(attrs))
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+
+def _chunks(html: str):
+    for start in range(0, len(html), CHUNK_SIZE):
+        yield html[start:start + CHUNK_SIZE]
+
+
+def _parse_with_lxml(html: str, collector: _LinkCollector):
+    parser = etree.HTMLPullParser(events=('start', 'end'))
+    for chunk in _chunks(html):
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if not isinstance(element.tag, str):
+                continue
+            if event == 'start':
+                collector.start(element.tag, element.attrib)
+            elif element.tag == 'a' and collector.in_anchor:
+                collector.end('a', ''.join(part.strip() for part in element.itertext()))
+                element.clear()
+            else:
+                collector.end(element.tag)
+                # Free parsed elements as we go, but keep anchor contents until the anchor ends
+                if not collector.in_anchor:
+                    element.clear()
+    parser.close()
+
+
+def _parse_with_stdlib(html: str, collector: _LinkCollector):
+    parser = _StreamingParser(collector)
+    for chunk in _chunks(html):
+        parser.feed(chunk)
+    parser.close()
+
+
+def _collect(html: str, collector: _LinkCollector, parser: str) -> _LinkCollector:
+    try:
+        if parser == 'lxml':
+            _parse_with_lxml(html, collector)
+        else:
+            _parse_with_stdlib(html, collector)
+    except _StopParsing:
+        pass
+    return collector
+
+
+def extract_links(html: str, base_url: str, scope: Optional[str] = None,
+                  expected_links: Optional[int] = None, parser: str = 'auto') -> List[Dict]:
+    """Extract CSV/Excel download links from a page.
+
+    Args:
+        html: Page markup
+        base_url: URL of the page, used to resolve relative links
+        scope: Only collect links inside the first element matching this selector
+            (see parse_selector). If nothing matches, or the element holds no
+            data links, the whole page is scanned.
+        expected_links: Stop parsing once this many links have been found
+        parser: 'lxml', 'stdlib' or 'auto' (lxml when installed)
+
+    Returns:
+        List of {'url', 'base_url', 'text'} dicts in page order
+    """
+    if parser == 'auto':
+        parser = 'lxml' if etree is not None else 'stdlib'
+    elif parser == 'lxml' and etree is None:
+        logger.warning("lxml is not installed, using the standard library HTML parser")
+        parser = 'stdlib'
+
+    collector = _collect(html, _LinkCollector(base_url, scope, expected_links), parser)
+    if scope and not collector.links:
+        if collector.scope_matched:
+            logger.warning(f"No data links inside scope {scope!r} on {base_url}, scanning the whole page")
+        else:
+            logger.warning(f"Scope {scope!r} not found on {base_url}, scanning the whole page")
+        collector = _collect(html, _LinkCollector(base_url, None, expected_links), parser)
+    return collector.links
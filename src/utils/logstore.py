@@ -0,0 +1,131 @@
+import glob
+import json
+import logging
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from utils.statefile import file_lock
+
+logger = logging.getLogger(__name__)
+
+
+class JsonLinesLog:
+    """Append-only JSON Lines log with size and age based rotation.
+
+    Each append is a single O_APPEND write, so concurrent writers never
+    interleave partial lines. Rotation happens under the log's file lock, so
+    writers in other processes do not rotate it twice. Rotated files are
+    kept, so no history is dropped.
+    """
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None, max_age_days: Optional[int] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _rotated_paths(self) -> List[str]:
+        """Return the rotated files, oldest first."""
+        base, ext = os.path.splitext(self.path)
+        return sorted(glob.glob(f"{base}.*{ext}"))
+
+    def _first_timestamp(self) -> Optional[str]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.loads(f.readline()).get('timestamp')
+        except Exception:
+            return None
+
+    def _should_rotate(self) -> bool:
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return False
+        if self.max_bytes is not None and os.path.getsize(self.path) >= self.max_bytes:
+            return True
+        if self.max_age_days is not None:
+            first = self._first_timestamp()
+            cutoff = (datetime.now() - timedelta(days=self.max_age_days)).isoformat()
+            if first is not None and first < cutoff:
+                return True
+        return False
+
+    def rotate(self):
+        """Move the current file aside under a timestamped name (callers hold the log's lock)."""
+        base, ext = os.path.splitext(self.path)
+        rotated = f"{base}.{datetime.now().strftime('%Y%m%dT%H%M%S%f')}{ext}"
+        try:
+            os.replace(self.path, rotated)
+            logger.info(f"Rotated log {self.path} to {rotated}")
+        except FileNotFoundError:
+            pass  # Nothing written since the last rotation
+
+    def append_many(self, entries: Iterable[Dict]):
+        """Append entries with a single atomic write."""
+        data = ''.join(json.dumps(entry, default=str) + '\n' for entry in entries).encode('utf-8')
+        if not data:
+            return
+        if self._should_rotate():
+            with file_lock(self.path):
+                # Another writer may have rotated the file while we waited for the lock
+                if self._should_rotate():
+                    self.rotate()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def append(self, entry: Dict):
+        """Append a single entry."""
+        self.append_many([entry])
+
+    @contextmanager
+    def batch(self):
+        """Collect entries and write them all at once when the block exits."""
+        batch = LogBatch()
+        try:
+            yield batch
+        finally:
+            self.append_many(batch.entries)
+
+    def read_all(self, include_rotated: bool = True) -> List[Dict]:
+        """Read every entry, oldest first, skipping lines that are not valid JSON."""
+        paths = (self._rotated_paths() if include_rotated else []) + [self.path]
+        entries = []
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping malformed line in {path}")
+        return entries
+
+    def migrate_from_json(self, legacy_path: str):
+        """Import a legacy JSON array log once, then move it out of the way."""
+        if not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, 'r') as f:
+                entries = json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not migrate legacy log {legacy_path}: {str(e)}")
+            return
+        self.append_many(entries)
+        os.replace(legacy_path, legacy_path + '.migrated')
+        logger.info(f"Migrated {len(entries)} entries from {legacy_path} to {self.path}")
+
+
+class LogBatch:
+    """Entries collected by JsonLinesLog.batch() until the batch is flushed."""
+
+    def __init__(self):
+        self.entries = []
+
+    def append(self, entry: Dict):
+        self.entries.append(entry)
@@ -0,0 +1,56 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Optional
+
+import pandas as pd
+
+from utils.statefile import read_json, write_json
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_SUFFIX = '.manifest.json'
+DIGEST_ALGORITHM = 'sha256(hash_pandas_object)'
+
+
+def compute_digest(df: pd.DataFrame) -> str:
+    """Compute a canonical content digest of a DataFrame.
+
+    The digest covers the column names and the row values, but not the index,
+    so two parses of the same source data always produce the same digest.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(json.dumps([str(col) for col in df.columns]).encode('utf-8'))
+    hasher.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return hasher.hexdigest()
+
+
+def manifest_path(file_path: str) -> str:
+    """Return the path of the sidecar manifest for a data file."""
+    return os.path.splitext(file_path)[0] + MANIFEST_SUFFIX
+
+
+def load_manifest(file_path: str) -> Optional[Dict]:
+    """Load the sidecar manifest for a data file, or None if there is none."""
+    path = manifest_path(file_path)
+    try:
+        return read_json(path)
+    except Exception as e:
+        logger.warning(f"Could not read manifest {path}: {str(e)}")
+        return None
+
+
+def save_manifest(file_path: str, df: pd.DataFrame, digest: str) -> Dict:
+    """Write the sidecar manifest for a data file."""
+    manifest = {
+        'file': os.path.basename(file_path),
+        'algorithm': DIGEST_ALGORITHM,
+        'digest': digest,
+        'rows': len(df),
+        'columns': [str(col) for col in df.columns],
+        'updated_at': datetime.now().isoformat()
+    }
+    write_json(manifest_path(file_path), manifest)
+    return manifest
@@ -0,0 +1,118 @@
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Decimal places numeric values are rounded to before comparison
+DEFAULT_PRECISION = 5
+
+
+@dataclass
+class ComparisonResult:
+    """Outcome of comparing two versions of a dataset."""
+    equal: bool
+    shape_changed: bool
+    old_shape: Tuple[int, int]
+    new_shape: Tuple[int, int]
+    cell_diff_count: Optional[int] = None  # None when the shapes differ
+    diff_rows: List[int] = field(default_factory=list)  # First few differing row positions
+
+    @property
+    def status(self) -> str:
+        if self.equal:
+            return "equal"
+        return "shape-changed" if self.shape_changed else "cells-changed"
+
+
+def normalize_column(series: pd.Series, precision: int = DEFAULT_PRECISION) -> pd.Series:
+    """Normalize a column into a comparable form without per-cell Python calls.
+
+    Numeric columns become float64 rounded to ``precision`` with NaN for nulls.
+    Everything else becomes stripped strings with None for nulls and blanks.
+    """
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+        return pd.Series(np.round(values, precision), name=series.name)
+
+    null_mask = series.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(series):
+        strings = series.astype(str)
+    else:
+        strings = series.astype(str).str.strip()
+        null_mask |= (strings == '').to_numpy()
+    return strings.where(~null_mask, None).reset_index(drop=True)
+
+
+def normalize_frame(df: pd.DataFrame, precision: int = DEFAULT_PRECISION) -> pd.DataFrame:
+    """Normalize every column of a DataFrame, dropping the index."""
+    df = df.reset_index(drop=True)
+    return pd.DataFrame({i: normalize_column(df.iloc[:, i], precision) for i in range(df.shape[1])})
+
+
+def _align_columns(old: pd.Series, new: pd.Series, precision: int) -> Tuple[pd.Series, pd.Series]:
+    """Bring a numeric and a string column to a common representation."""
+    old_numeric = pd.api.types.is_float_dtype(old)
+    new_numeric = pd.api.types.is_float_dtype(new)
+    if old_numeric == new_numeric:
+        return old, new
+
+    numeric, text = (old, new) if old_numeric else (new, old)
+
+    # Prefer numbers if every non-null string parses as one
+    coerced = pd.to_numeric(text, errors='coerce')
+    if (coerced.isna() == text.isna()).all():
+        text = pd.Series(np.round(coerced.to_numpy(dtype='float64'), precision))
+    else:
+        formatted = np.char.mod(f'%.{precision}f', numeric.fillna(0).to_numpy())
+        numeric = pd.Series(formatted, dtype=object).where(numeric.notna(), None)
+
+    return (numeric, text) if old_numeric else (text, numeric)
+
+
+def cell_mismatch(old: pd.Series, new: pd.Series, precision: int = DEFAULT_PRECISION) -> np.ndarray:
+    """Return a boolean mask of positions where two normalized columns differ."""
+    old, new = _align_columns(old.reset_index(drop=True), new.reset_index(drop=True), precision)
+    both_null = old.isna().to_numpy() & new.isna().to_numpy()
+    return ~((old.to_numpy() == new.to_numpy()) | both_null)
+
+
+def compare_frames(old_df: pd.DataFrame, new_df: pd.DataFrame,
+                   precision: int = DEFAULT_PRECISION, max_diff_rows: int = 3) -> ComparisonResult:
+    """Compare two DataFrames by position, ignoring column names and index.
+
+    Numeric values are compared after rounding to ``precision`` decimal places
+    and nulls compare equal to nulls and blank strings.
+    """
+    old_shape, new_shape = old_df.shape, new_df.shape
+    if old_shape != new_shape:
+        return ComparisonResult(equal=False, shape_changed=True, old_shape=old_shape, new_shape=new_shape)
+
+    # Frames read with the same schema can be compared as they are
+    if list(old_df.dtypes) == list(new_df.dtypes):
+        aligned_new = new_df.reset_index(drop=True).set_axis(old_df.columns, axis=1)
+        if old_df.reset_index(drop=True).equals(aligned_new):
+            return ComparisonResult(equal=True, shape_changed=False, old_shape=old_shape,
+                                    new_shape=new_shape, cell_diff_count=0)
+
+    old_norm = normalize_frame(old_df, precision)
+    new_norm = normalize_frame(new_df, precision)
+
+    # Cheapest check first - identical normalized frames
+    if old_norm.equals(new_norm):
+        return ComparisonResult(equal=True, shape_changed=False, old_shape=old_shape,
+                                new_shape=new_shape, cell_diff_count=0)
+
+    row_mismatch = np.zeros(old_shape[0], dtype=bool)
+    cell_diff_count = 0
+    for col in old_norm.columns:
+        mismatch = cell_mismatch(old_norm[col], new_norm[col], precision)
+        cell_diff_count += int(mismatch.sum())
+        row_mismatch |= mismatch
+
+    diff_rows = np.flatnonzero(row_mismatch)[:max_diff_rows].tolist()
+    return ComparisonResult(equal=cell_diff_count == 0, shape_changed=False, old_shape=old_shape,
+                            new_shape=new_shape, cell_diff_count=cell_diff_count, diff_rows=diff_rows)
@@ -0,0 +1,98 @@
+import logging
+import smtplib
+import traceback
+from datetime import datetime
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Dict, List, Optional
+
+from config.settings import EMAIL_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def format_files_list(files_downloaded: Dict[str, List[str]], changes: Optional[Dict[str, Dict]] = None) -> str:
+    """List the downloaded files per country, with their row-level change counts when known."""
+    files_list = ""
+    for country, files in (files_downloaded or {}).items():
+        if files:
+            files_list += f"- {country}: {', '.join(files)}\n"
+            for file_name in files:
+                if changes and file_name in changes:
+                    summary = changes[file_name]
+                    files_list += (f"    {file_name}: {summary['added']} added, {summary['removed']} removed, "
+                                   f"{summary['modified']} modified rows\n")
+    return files_list
+
+
+def send_email(settings: Dict, recipients: List[str], subject: str, message: str,
+               files_downloaded: Dict[str, List[str]], changes: Optional[Dict[str, Dict]] = None) -> bool:
+    """Send a NEW_FILES notification email.
+
+    ``settings`` has the keys saved in email_config.json (sender_email,
+    sender_password, smtp_server, smtp_port, smtp_use_tls). Returns whether
+    the email was sent.
+    """
+    if not settings.get('sender_email') or not settings.get('sender_password'):
+        logger.warning("Sender email or password not configured")
+        return False
+
+    try:
+        # Apply prefix to subject
+        full_subject = f"{EMAIL_CONFIG['EMAIL_SUBJECT_PREFIX']}{subject}"
+
+        # Create message
+        msg = MIMEMultipart()
+        msg['From'] = f"{EMAIL_CONFIG['EMAIL_FROM_NAME']} <{settings['sender_email']}>"
+
+        # Check maximum recipients
+        recipients = list(recipients)
+        if len(recipients) > EMAIL_CONFIG["MAX_RECIPIENTS"]:
+            logger.warning(f"Too many recipients: {len(recipients)}. Trimming to {EMAIL_CONFIG['MAX_RECIPIENTS']}")
+            recipients = recipients[:EMAIL_CONFIG["MAX_RECIPIENTS"]]
+
+        # Format recipients according to RFC standards for multiple recipients
+        msg['To'] = ", ".join(recipients)
+        msg['Subject'] = full_subject
+
+        files_list = format_files_list(files_downloaded, changes)
+        email_body = EMAIL_CONFIG["TEMPLATES"]["NEW_FILES"].format(
+            message=message,
+            files_list=files_list if files_list else "No specific files listed",
+            timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        )
+        msg.attach(MIMEText(email_body, 'plain'))
+
+        # Connect to SMTP server and send email
+        server_connection = smtplib.SMTP(settings.get('smtp_server', EMAIL_CONFIG["SMTP_SERVER"]),
+                                         settings.get('smtp_port', EMAIL_CONFIG["SMTP_PORT"]),
+                                         timeout=EMAIL_CONFIG["SMTP_TIMEOUT_SECONDS"])
+        if settings.get('smtp_use_tls', EMAIL_CONFIG["USE_TLS"]):
+            server_connection.starttls()
+        server_connection.login(settings['sender_email'], settings['sender_password'])
+        server_connection.send_message(msg)
+        server_connection.quit()
+
+        logger.info(f"Email notification sent to {len(recipients)} recipients")
+        return True
+
+    except Exception as e:
+        logger.error(f"Failed to send email notification: {str(e)}")
+        logger.error(traceback.format_exc())
+        return False
+
+
+def notify_new_files(settings: Dict, recipients: List[str], files_downloaded: Dict[str, List[str]],
+                     changes: Optional[Dict[str, Dict]] = None) -> bool:
+    """Email the recipients about the files a fetch saved, if notifications are enabled.
+
+    Nothing is sent when the fetch saved no new files.
+    """
+    total_files = sum(len(files) for files in files_downloaded.values())
+    if not total_files:
+        return False
+    if not settings.get('email_notifications_enabled') or not recipients:
+        logger.info("Email notifications are disabled or no recipients configured")
+        return False
+    return send_email(settings, recipients, "New hospital data downloaded",
+                      f"{total_files} dataset(s) changed since the last fetch.", files_downloaded, changes)
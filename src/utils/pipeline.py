@@ -0,0 +1,153 @@
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from config.settings import LOG_ROTATION
+from utils.history import FetchHistoryStore
+from utils.instrumentation import profile_capture
+from utils.logstore import JsonLinesLog
+from utils.sources import SOURCES, SourceRegistry
+
+logger = logging.getLogger(__name__)
+
+LOG_DIR = os.path.join('src', 'data', 'logs')
+
+
+def get_source_key(country, url, sources: SourceRegistry = SOURCES):
+    """Return the id of the data source of a provider page URL."""
+    return sources.resolve(url, country).id
+
+
+def filter_active_urls(urls: Dict[str, List[str]], active_sources: Optional[Dict[str, bool]]) -> Dict[str, List[str]]:
+    """Keep only the URLs whose source is enabled (sources are enabled by default)."""
+    active_sources = active_sources or {}
+    return {
+        country: [url for url in country_urls if active_sources.get(get_source_key(country, url), True)]
+        for country, country_urls in urls.items()
+    }
+
+
+def open_status_stores(log_dir: str = LOG_DIR) -> Tuple[JsonLinesLog, FetchHistoryStore]:
+    """Open the fetch status log and its indexed history store.
+
+    Imports the legacy fetch_status.json on first use and backfills the
+    history store from the log if it is empty.
+    """
+    status_log = JsonLinesLog(os.path.join(log_dir, 'fetch_status.jsonl'),
+                              max_bytes=LOG_ROTATION["MAX_BYTES"],
+                              max_age_days=LOG_ROTATION["MAX_AGE_DAYS"])
+    status_log.migrate_from_json(os.path.join(log_dir, 'fetch_status.json'))
+
+    history_store = FetchHistoryStore(os.path.join(log_dir, 'fetch_status.db'))
+    # Only read the whole log (rotated files included) while the store is still empty
+    if history_store.is_empty():
+        history_store.backfill(status_log.read_all())
+    return status_log, history_store
+
+
+def status_entry(country, url, status, error_message=None, data_updated=False,
+                 sources: SourceRegistry = SOURCES) -> Dict:
+    """Build a fetch status log entry."""
+    log_entry = {
+        'timestamp': datetime.now().isoformat(),
+        'country': country,
+        'source': get_source_key(country, url, sources),
+        'url': url,
+        'status': status,
+        'data_updated': data_updated
+    }
+    if error_message:
+        log_entry['error'] = error_message
+    return log_entry
+
+
+async def run_fetch(fetcher, active_urls: Dict[str, List[str]], status_log: JsonLinesLog,
+                    history_store: FetchHistoryStore, profiler: Optional[str] = None):
+    """Fetch links and download files for the active URLs, logging one status entry per URL.
+
+    The run's stage timings are saved to the fetcher's trace log. With
+    ``profiler`` ('cprofile' or 'pyinstrument') the run is also profiled and
+    the report saved to src/data/logs/profiles.
+
+    Returns (results, stats, files_downloaded).
+    """
+    fetcher.begin_trace()
+    try:
+        with profile_capture(profiler, os.path.join(LOG_DIR, 'profiles')):
+            return await _run_fetch(fetcher, active_urls, status_log, history_store)
+    finally:
+        entry = fetcher.end_trace()
+        logger.info(f"Fetch run took {entry['duration_seconds']:.2f}s")
+
+
+async def _run_fetch(fetcher, active_urls: Dict[str, List[str]], status_log: JsonLinesLog,
+                     history_store: FetchHistoryStore):
+    # Update fetcher with only active URLs
+    fetcher.urls = active_urls
+
+    all_logs = []
+    files_downloaded = {}
+    try:
+        results, stats = await fetcher.fetch_links()
+
+        # First, check if there are any files to download
+        pre_download_checks = {}
+        for country, urls in active_urls.items():
+            pre_download_checks[country] = {}
+            for url in urls:
+                # Check if the URL was successfully fetched
+                country_results = results.get(country, [])
+                links_for_url = [link for link in country_results if link['base_url'] == url]
+                was_successful = len(links_for_url) > 0
+
+                # Store result for later use
+                pre_download_checks[country][url] = {
+                    'successful': was_successful,
+                    'links': links_for_url
+                }
+
+        # Download files only once
+        if results:
+            files_downloaded = await fetcher.download_files(results)
+
+        # Now create logs with the data_updated flag, written once for the whole run
+        with status_log.batch() as batch:
+            for country, url_checks in pre_download_checks.items():
+                for url, check_result in url_checks.items():
+                    status = "success" if check_result['successful'] else "failed"
+
+                    # Check if any of the downloaded files came from this URL
+                    data_updated = False
+                    if status == "success":
+                        url_files = {fetcher._get_file_name(link['base_url'], country) for link in check_result['links']}
+                        data_updated = any(file_name in url_files for file_name in files_downloaded.get(country, []))
+
+                    log_entry = status_entry(country, url, status, fetcher.page_errors.get(url), data_updated,
+                                             fetcher.sources)
+                    # Record the host's circuit breaker state after this run
+                    log_entry['circuit'] = fetcher.breaker.state(urlparse(url).netloc)
+                    if status == "success":
+                        drift = {file_name: fetcher.schema_drift[file_name] for file_name in url_files
+                                 if file_name in fetcher.schema_drift}
+                        if drift:
+                            log_entry['schema_drift'] = drift
+                    batch.append(log_entry)
+                    all_logs.append(log_entry)
+                    logger.info(f"Logged fetch status: {status} for {country} - {url}, Data updated: {data_updated}")
+        history_store.record_many(all_logs)
+
+        return results, stats, files_downloaded
+    except Exception as e:
+        # Log any unexpected errors
+        with status_log.batch() as batch:
+            for country, urls in active_urls.items():
+                for url in urls:
+                    log_entry = status_entry(country, url, "error", str(e), data_updated=False, sources=fetcher.sources)
+                    batch.append(log_entry)
+                    all_logs.append(log_entry)
+        history_store.record_many(all_logs)
+
+        logger.error(f"Error fetching data: {str(e)}")
+        return {}, {"successful": 0, "failed": 0, "total_attempts": 0}, {}
@@ -0,0 +1,103 @@
+import logging
+import time
+from typing import Dict
+
+from curl_cffi import CurlError
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+from config.settings import RETRY_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class TransientHTTPError(Exception):
+    """A response status worth retrying (rate limiting or a server error)."""
+
+    def __init__(self, url: str, status_code: int):
+        super().__init__(f"Status {status_code} from {url}")
+        self.url = url
+        self.status_code = status_code
+
+
+# Errors that may go away on their own: timeouts, connection failures and 429/5xx responses
+TRANSIENT_ERRORS = (CurlError, TransientHTTPError)
+
+
+def check_status(url: str, status_code: int):
+    """Raise TransientHTTPError if a status code should be retried."""
+    if status_code in RETRY_CONFIG["RETRY_STATUS_CODES"]:
+        raise TransientHTTPError(url, status_code)
+
+
+def retrying() -> AsyncRetrying:
+    """Build a jittered exponential retry policy for a single request."""
+    return AsyncRetrying(
+        stop=stop_after_attempt(RETRY_CONFIG["ATTEMPTS"]),
+        wait=wait_random_exponential(multiplier=RETRY_CONFIG["BACKOFF_MULTIPLIER"],
+                                     max=RETRY_CONFIG["BACKOFF_MAX_SECONDS"]),
+        retry=retry_if_exception_type(TRANSIENT_ERRORS),
+        before_sleep=lambda state: logger.warning(
+            f"Retrying after attempt {state.attempt_number} failed: {state.outcome.exception()}"
+        ),
+        reraise=True
+    )
+
+
+class CircuitBreaker:
+    """Per-host circuit breaker.
+
+    After ``failure_threshold`` consecutive failures a host's circuit opens and
+    requests to it are skipped for ``cooldown_seconds``. After the cool-down one
+    trial request is let through (half-open); its outcome closes or re-opens
+    the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = RETRY_CONFIG["BREAKER_FAILURE_THRESHOLD"],
+                 cooldown_seconds: float = RETRY_CONFIG["BREAKER_COOLDOWN_SECONDS"]):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.hosts: Dict[str, Dict] = {}
+
+    def _host(self, host: str) -> Dict:
+        return self.hosts.setdefault(host, {'failures': 0, 'opened_at': None, 'trial_in_flight': False})
+
+    def state(self, host: str) -> str:
+        """Return 'closed', 'open' or 'half-open' for a host."""
+        entry = self._host(host)
+        if entry['opened_at'] is None:
+            return 'closed'
+        if time.monotonic() - entry['opened_at'] >= self.cooldown_seconds:
+            return 'half-open'
+        return 'open'
+
+    def allow(self, host: str) -> bool:
+        """Whether a request to the host may be sent now."""
+        state = self.state(host)
+        if state == 'closed':
+            return True
+        entry = self._host(host)
+        if state == 'half-open' and not entry['trial_in_flight']:
+            entry['trial_in_flight'] = True
+            return True
+        return False
+
+    def record_success(self, host: str):
+        entry = self._host(host)
+        if entry['opened_at'] is not None:
+            logger.info(f"Circuit closed for {host}")
+        entry.update(failures=0, opened_at=None, trial_in_flight=False)
+
+    def record_failure(self, host: str):
+        entry = self._host(host)
+        entry['failures'] += 1
+        entry['trial_in_flight'] = False
+        if entry['opened_at'] is not None or entry['failures'] >= self.failure_threshold:
+            entry['opened_at'] = time.monotonic()
+            logger.warning(f"Circuit open for {host} after {entry['failures']} failures, "
+                           f"skipping it for {self.cooldown_seconds} seconds")
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Return the state and failure count of every known host."""
+        # Copied first, since fetches may add hosts while another thread reads this
+        return {host: {'state': self.state(host), 'failures': entry['failures']}
+                for host, entry in list(self.hosts.items())}
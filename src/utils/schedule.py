@@ -0,0 +1,176 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Hashable, List, Optional
+
+from config.settings import SCHEDULER
+from utils.statefile import read_json
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_CONFIG_FILE = os.path.join('src', 'data', 'config', 'schedule_config.json')
+SCHEDULER_STATE_FILE = os.path.join('src', 'data', 'config', 'scheduler_state.json')
+
+# A daemon whose heartbeat is older than this is considered stopped
+HEARTBEAT_TIMEOUT_SECONDS = 180
+
+
+def calculate_next_run(config: Dict, now: Optional[datetime] = None) -> datetime:
+    """Calculate the next run time for a schedule configuration.
+
+    ``config`` uses the keys saved in schedule_config.json: schedule_type
+    (hourly, daily, weekly, monthly or custom), schedule_hour, schedule_minute,
+    schedule_day, schedule_weekday (0=Monday) and custom_minutes.
+    """
+    now = now or datetime.now()
+    schedule_type = config.get('schedule_type', 'hourly')
+    hour = config.get('schedule_hour', 0)
+    minute = config.get('schedule_minute', 0)
+
+    if schedule_type == "hourly":
+        # Run at the specified minute of each hour
+        if now.minute >= minute:
+            next_run = now.replace(minute=minute, second=0, microsecond=0) + timedelta(hours=1)
+        else:
+            next_run = now.replace(minute=minute, second=0, microsecond=0)
+
+    elif schedule_type == "daily":
+        # Run at the specified hour and minute each day
+        target_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if now >= target_time:
+            next_run = target_time + timedelta(days=1)
+        else:
+            next_run = target_time
+
+    elif schedule_type == "weekly":
+        # Run on specified weekday (0=Monday, 6=Sunday) at specified time
+        days_ahead = config.get('schedule_weekday', 0) - now.weekday()
+        target_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+        # If it's the same day but time has passed, schedule for next week
+        if days_ahead == 0 and now >= target_time:
+            days_ahead = 7
+        # If it's a day in the past this week, schedule for next week
+        elif days_ahead < 0:
+            days_ahead += 7
+
+        next_run = target_time + timedelta(days=days_ahead)
+
+    elif schedule_type == "monthly":
+        # Run on specified day of month at specified time
+        target_day = min(config.get('schedule_day', 1), 28)  # To avoid month boundary issues
+
+        if now.day > target_day or (now.day == target_day and
+                                    (now.hour > hour or (now.hour == hour and now.minute >= minute))):
+            # Go to next month
+            if now.month == 12:
+                next_run = datetime(now.year + 1, 1, target_day, hour, minute)
+            else:
+                next_run = datetime(now.year, now.month + 1, target_day, hour, minute)
+        else:
+            # Still time this month
+            next_run = datetime(now.year, now.month, target_day, hour, minute)
+
+    elif schedule_type == "custom":
+        # Custom interval in minutes - simply add the custom interval to current time
+        next_run = now + timedelta(minutes=config.get('custom_minutes', 60))
+
+    else:
+        next_run = now
+
+    return next_run
+
+
+def with_jitter(run_time: datetime, jitter_seconds: float = SCHEDULER["JITTER_SECONDS"]) -> datetime:
+    """Push a run time back by a random 0 to ``jitter_seconds``."""
+    return run_time + timedelta(seconds=random.uniform(0, jitter_seconds)) if jitter_seconds > 0 else run_time
+
+
+def source_schedule(config: Dict, source) -> Dict:
+    """Return the schedule of a data source.
+
+    The source's override in the config's ``source_schedules`` (set from the
+    app) wins over its ``schedule`` in DATA_SOURCES; keys neither sets come
+    from the global schedule in ``config``.
+    """
+    override = config.get('source_schedules', {}).get(source.id) or source.schedule or {}
+    return {**config, **override}
+
+
+class TimerQueue:
+    """Run times of keys (e.g. source ids) in a min-heap, earliest first.
+
+    Scheduling a key again replaces its earlier run time; replaced and
+    cancelled entries are dropped lazily when they reach the top of the heap.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._entries = {}  # key -> (run_time, sequence) of its live heap entry
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def schedule(self, key: Hashable, run_time: datetime):
+        entry = (run_time, next(self._sequence))
+        self._entries[key] = entry
+        heapq.heappush(self._heap, (*entry, key))
+
+    def cancel(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def _drop_stale(self):
+        while self._heap and self._entries.get(self._heap[0][2]) != self._heap[0][:2]:
+            heapq.heappop(self._heap)
+
+    def next_run(self) -> Optional[datetime]:
+        """Return the earliest run time, or None if nothing is scheduled."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: Optional[datetime] = None) -> List[Hashable]:
+        """Remove and return the keys whose run time has come, earliest first."""
+        now = now or datetime.now()
+        due = []
+        while self.next_run() is not None and self._heap[0][0] <= now:
+            _, _, key = heapq.heappop(self._heap)
+            del self._entries[key]
+            due.append(key)
+        return due
+
+    def run_times(self) -> Dict[Hashable, datetime]:
+        return {key: run_time for key, (run_time, _) in self._entries.items()}
+
+
+def load_schedule_config(config_file: str = SCHEDULE_CONFIG_FILE) -> Dict:
+    """Load the saved schedule configuration, or an empty dict."""
+    try:
+        return read_json(config_file, {})
+    except Exception as e:
+        logger.error(f"Failed to load schedule configuration: {str(e)}")
+        return {}
+
+
+def load_scheduler_state(state_file: str = SCHEDULER_STATE_FILE) -> Optional[Dict]:
+    """Load the state published by the scheduler daemon, or None."""
+    try:
+        return read_json(state_file)
+    except Exception as e:
+        logger.warning(f"Failed to load scheduler state: {str(e)}")
+        return None
+
+
+def scheduler_daemon_alive(state: Optional[Dict], now: Optional[datetime] = None) -> bool:
+    """Whether the scheduler daemon has published a recent heartbeat."""
+    if not state or not state.get('heartbeat'):
+        return False
+    now = now or datetime.now()
+    heartbeat = datetime.fromisoformat(state['heartbeat'])
+    return (now - heartbeat).total_seconds() <= HEARTBEAT_TIMEOUT_SECONDS
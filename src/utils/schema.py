@@ -0,0 +1,135 @@
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from config.settings import DATASET_CATEGORICALS
+from utils.statefile import read_json, update_json
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SchemaDrift:
+    """Differences between a dataset's registered schema and a new version of it."""
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    retyped: Dict[str, Tuple[str, str]] = field(default_factory=dict)  # column -> (old dtype, new dtype)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.retyped)
+
+    def describe(self) -> str:
+        parts = []
+        if self.added:
+            parts.append(f"added columns {self.added}")
+        if self.removed:
+            parts.append(f"removed columns {self.removed}")
+        for column, (old, new) in self.retyped.items():
+            parts.append(f"{column}: {old} -> {new}")
+        return ', '.join(parts)
+
+    def to_dict(self) -> Dict:
+        return {'added': self.added, 'removed': self.removed,
+                'retyped': {column: list(types) for column, types in self.retyped.items()}}
+
+
+class SchemaRegistry:
+    """Column names and dtypes of each saved dataset.
+
+    A dataset's schema is registered whenever its CSV is written, so the CSV
+    can be read back with the same dtypes instead of inferring them again.
+    Columns listed in DATASET_CATEGORICALS are stored as categoricals.
+    """
+
+    def __init__(self, registry_file: str, categoricals: Optional[Dict[str, List[str]]] = None):
+        self.registry_file = registry_file
+        self.categoricals = DATASET_CATEGORICALS if categoricals is None else categoricals
+        self.schemas = {}
+
+        os.makedirs(os.path.dirname(registry_file), exist_ok=True)
+        try:
+            self.schemas = read_json(registry_file, {})
+        except Exception as e:
+            logger.warning(f"Could not load schema registry, starting empty: {str(e)}")
+            self.schemas = {}
+
+    def get(self, name: str) -> Optional[Dict]:
+        """Return the registered schema of a dataset: {'columns', 'dtypes', 'updated_at'}."""
+        return self.schemas.get(name)
+
+    def _categorical_columns(self, name: str, columns) -> List:
+        # Configured names are matched ignoring case and surrounding whitespace
+        wanted = {str(column).strip().lower() for column in self.categoricals.get(name, [])}
+        return [column for column in columns if str(column).strip().lower() in wanted]
+
+    def apply(self, name: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Cast the dataset's categorical columns to the category dtype."""
+        columns = [column for column in self._categorical_columns(name, df.columns)
+                   if not isinstance(df[column].dtype, pd.CategoricalDtype)]
+        if not columns:
+            return df
+        return df.astype({column: 'category' for column in columns})
+
+    def check(self, name: str, df: pd.DataFrame) -> SchemaDrift:
+        """Compare a DataFrame with the dataset's registered schema."""
+        schema = self.get(name)
+        if schema is None:
+            return SchemaDrift()
+        new_dtypes = {str(column): str(dtype) for column, dtype in df.dtypes.items()}
+        old_dtypes = schema['dtypes']
+        return SchemaDrift(
+            added=[column for column in new_dtypes if column not in old_dtypes],
+            removed=[column for column in old_dtypes if column not in new_dtypes],
+            retyped={column: (old_dtypes[column], dtype) for column, dtype in new_dtypes.items()
+                     if column in old_dtypes and old_dtypes[column] != dtype}
+        )
+
+    @staticmethod
+    def describe(df: pd.DataFrame) -> Dict:
+        """Return the schema of a DataFrame: {'columns', 'dtypes'}."""
+        return {
+            'columns': [str(column) for column in df.columns],
+            'dtypes': {str(column): str(dtype) for column, dtype in df.dtypes.items()}
+        }
+
+    def register(self, name: str, df: pd.DataFrame):
+        """Record the schema of the version of a dataset that was just saved."""
+        self.register_schema(name, self.describe(df))
+
+    def register_schema(self, name: str, schema: Dict):
+        """Record a schema produced by describe()."""
+        current = self.get(name)
+        if current is not None and current['columns'] == schema['columns'] and current['dtypes'] == schema['dtypes']:
+            return
+        entry = {**schema, 'updated_at': datetime.now().isoformat()}
+        self.schemas[name] = entry
+        try:
+            # Keep schemas other processes registered since this registry was loaded
+            self.schemas = update_json(self.registry_file, lambda schemas: {**schemas, name: entry}, {})
+        except Exception as e:
+            logger.error(f"Error saving schema registry: {str(e)}")
+
+    def read_csv(self, path: str, name: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read a saved dataset CSV with its registered dtypes.
+
+        Falls back to dtype inference if the file does not match the registered
+        schema (or none is registered yet).
+        """
+        schema = self.get(name)
+        if schema is not None:
+            dtypes = {column: dtype for column, dtype in schema['dtypes'].items()
+                      if not dtype.startswith('datetime64')}
+            dates = [column for column, dtype in schema['dtypes'].items() if dtype.startswith('datetime64')]
+            if columns is not None:
+                dtypes = {column: dtype for column, dtype in dtypes.items() if column in columns}
+                dates = [column for column in dates if column in columns]
+            try:
+                return pd.read_csv(path, usecols=columns, dtype=dtypes, parse_dates=dates or None)
+            except (ValueError, TypeError) as e:
+                logger.warning(f"{os.path.basename(path)} does not match the registered schema of {name}, "
+                               f"inferring dtypes: {str(e)}")
+        return self.apply(name, pd.read_csv(path, usecols=columns))
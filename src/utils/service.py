@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from config.settings import HEADERS, DATA_PROVIDER_URLS
+from utils.fetcher import LinkFetcher
+from utils.jobs import FetchJob, JobRunner
+from utils.notify import notify_new_files
+from utils.pipeline import open_status_stores, run_fetch
+from utils.session_pool import run_in_shared_loop
+from utils.singleflight import SourceFlights
+from utils.statefile import read_json, write_json
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join('src', 'data')
+
+# Saved configuration per topic: file name in src/data/config and its value when missing
+CONFIG_FILES = {
+    'schedule': ('schedule_config.json', {}),
+    'email': ('email_config.json', {}),
+    'recipients': ('email_recipients.json', []),
+}
+
+
+def config_path(topic: str, data_dir: str = DATA_DIR) -> str:
+    """Return the path of a topic's saved configuration file."""
+    return os.path.join(data_dir, 'config', CONFIG_FILES[topic][0])
+
+
+class AppService:
+    """State shared by every dashboard session of the app process.
+
+    Owns the LinkFetcher, the fetch status stores and the saved configuration,
+    so their memory and startup cost are paid once rather than per viewer.
+    Each change bumps the version of its topic ('schedule', 'email',
+    'recipients' or 'history'); sessions compare it with the version they
+    last saw to pick up changes made from other sessions.
+    """
+
+    def __init__(self, data_dir: str = DATA_DIR):
+        self.data_dir = data_dir
+        self.fetcher = LinkFetcher(
+            headers=HEADERS,
+            urls=DATA_PROVIDER_URLS,
+            download_dir=os.path.join(data_dir, 'downloads')
+        )
+        self.status_log, self.history_store = open_status_stores(os.path.join(data_dir, 'logs'))
+        self._versions = {}
+        self._versions_lock = threading.Lock()
+        # One fetch at a time, and one per source across sessions and the headless scheduler
+        self.flights = SourceFlights(os.path.join(data_dir, 'cache', 'flights'), self.fetcher.sources)
+        self.jobs = JobRunner(self._run_job)  # Background fetches started from the app
+        logger.info(f"App service started (pid {os.getpid()})")
+
+    def version(self, topic: str) -> int:
+        return self._versions.get(topic, 0)
+
+    def notify(self, topic: str):
+        """Mark a topic as changed for every session."""
+        with self._versions_lock:
+            self._versions[topic] = self._versions.get(topic, 0) + 1
+
+    def config_path(self, topic: str) -> str:
+        return config_path(topic, self.data_dir)
+
+    def load_config(self, topic: str) -> Any:
+        """Return a copy of the saved configuration of a topic."""
+        return read_json(self.config_path(topic), CONFIG_FILES[topic][1])
+
+    def save_config(self, topic: str, config: Any, indent: Optional[int] = 4):
+        write_json(self.config_path(topic), config, indent=indent)
+        self.notify(topic)
+
+    async def fetch(self, active_urls: Dict[str, List[str]], profiler: Optional[str] = None):
+        """Fetch the given URLs with the shared fetcher, joining fetches of the same sources already running."""
+        return await run_in_shared_loop(self._fetch(active_urls, profiler))
+
+    async def _fetch(self, active_urls, profiler, job: Optional[FetchJob] = None):
+        async def fetch(urls):
+            # Only the sources no one else is fetching, while this request holds the fetcher
+            self.fetcher.progress = job.add_event if job is not None else None
+            try:
+                results, stats, files_downloaded = await run_fetch(self.fetcher, urls, self.status_log,
+                                                                   self.history_store, profiler=profiler)
+                changes = dict(self.fetcher.changes)
+            finally:
+                self.fetcher.progress = None
+                self.notify('history')
+            # Emailed by the request that downloaded the files, so once per change
+            await asyncio.to_thread(notify_new_files, self.load_config('email'), self.load_config('recipients'),
+                                    files_downloaded, changes)
+            return results, stats, files_downloaded
+
+        return await self.flights.run(active_urls, fetch,
+                                      on_start=job.start if job is not None else None,
+                                      progress=job.add_event if job is not None else None)
+
+    async def _run_job(self, job: FetchJob):
+        return await self._fetch(job.urls, job.profiler, job)
+
+    def close(self):
+        self.fetcher.close()
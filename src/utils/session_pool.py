@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import threading
+from typing import Dict
+
+from curl_cffi import AsyncSession
+
+from config.settings import FETCH_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_shared_loop = None
+_sessions: Dict[asyncio.AbstractEventLoop, AsyncSession] = {}
+
+
+def get_shared_loop() -> asyncio.AbstractEventLoop:
+    """Return the process-wide event loop, starting its thread on first use.
+
+    Streamlit runs every rerun on a fresh event loop, so work that should reuse
+    connections (and outlive a single rerun) is run on this loop instead.
+    """
+    global _shared_loop
+    with _lock:
+        if _shared_loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name='shared-event-loop', daemon=True)
+            thread.start()
+            _shared_loop = loop
+            logger.info("Started shared event loop")
+        return _shared_loop
+
+
+def run_async(coroutine, timeout=None):
+    """Run a coroutine on the shared loop from synchronous code and return its result."""
+    future = asyncio.run_coroutine_threadsafe(coroutine, get_shared_loop())
+    return future.result(timeout)
+
+
+async def run_in_shared_loop(coroutine):
+    """Await a coroutine on the shared loop from any other event loop."""
+    loop = get_shared_loop()
+    try:
+        if asyncio.get_running_loop() is loop:
+            return await coroutine
+    except RuntimeError:
+        pass
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, loop))
+
+
+def get_session() -> AsyncSession:
+    """Return the long-lived HTTP session for the running event loop.
+
+    The session keeps its curl handles, and with them open connections and TLS
+    sessions, between calls. Browser impersonation negotiates HTTP/2 with hosts
+    that support it.
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None:
+        session = AsyncSession(loop=loop, max_clients=FETCH_CONCURRENCY["MAX_CONCURRENT_REQUESTS"])
+        _sessions[loop] = session
+        logger.info("Created pooled HTTP session")
+    return session
+
+
+async def close_session():
+    """Close the HTTP session of the running event loop, if there is one."""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import os
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from utils.sources import SOURCES, SourceRegistry
+from utils.statefile import file_lock, read_json, write_json
+
+logger = logging.getLogger(__name__)
+
+FLIGHTS_DIR = os.path.join('src', 'data', 'cache', 'flights')
+
+
+def _source_result(country: str, url: str, dataset: str, results: Dict, files_downloaded: Dict) -> Dict:
+    """The part of a fetch's (results, files_downloaded) that came from one source page."""
+    links = [link for link in results.get(country, []) if link['base_url'] == url]
+    return {
+        'country': country,
+        'links': links,
+        'files': [dataset] if dataset in files_downloaded.get(country, []) else []
+    }
+
+
+def _merge(source_results: List[Dict]):
+    """Combine per-source results into the (results, stats, files_downloaded) of run_fetch."""
+    results, files_downloaded = {}, {}
+    for source_result in source_results:
+        results.setdefault(source_result['country'], []).extend(source_result['links'])
+        files_downloaded.setdefault(source_result['country'], []).extend(source_result['files'])
+    stats = {
+        'timestamp': datetime.now().isoformat(),
+        'total_attempts': len(source_results),
+        'successful': sum(len(source_result['links']) for source_result in source_results),
+        'failed': sum(1 for source_result in source_results if not source_result['links'])
+    }
+    return results, stats, files_downloaded
+
+
+class SourceFlights:
+    """Single-flight coordination of fetches, keyed by data source.
+
+    A source is fetched by one request at a time. A request for a source
+    that is already being fetched in this process joins that flight and gets
+    its result. Across processes (the app and the headless scheduler), each
+    source's fetch holds a lock file in ``flights_dir`` and publishes its
+    result there; a request that had to wait for the lock reuses that result
+    if the fetch finished after the request was made. Fetches in one process
+    also run one at a time, since they share a LinkFetcher.
+    """
+
+    def __init__(self, flights_dir: str = FLIGHTS_DIR, sources: SourceRegistry = SOURCES):
+        self.flights_dir = flights_dir
+        self.sources = sources
+        self._flights = {}  # Source id -> future of its per-source result
+        self._lock = None  # Created on the event loop that runs the fetches
+
+    def _path(self, source_id: str) -> str:
+        return os.path.join(self.flights_dir, f"{source_id}.json")
+
+    async def run(self, active_urls: Dict[str, List[str]], fetch: Callable[[Dict[str, List[str]]], Awaitable],
+                  on_start: Optional[Callable[[], None]] = None, progress: Optional[Callable[[Dict], None]] = None):
+        """Fetch the active URLs, joining flights already under way.
+
+        ``fetch`` fetches a {country: [URLs]} dict and returns (results,
+        stats, files_downloaded) like run_fetch; it is only called for the
+        sources no other request is fetching. ``on_start`` is called when
+        this request's own fetch begins, and ``progress`` receives a 'joined'
+        or 'reused' event per source taken from another request.
+        Returns (results, stats, files_downloaded) for all the active URLs.
+        """
+        loop = asyncio.get_running_loop()
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        requested_at = datetime.now().isoformat()
+        flights, own = [], {}
+        for country, urls in active_urls.items():
+            for url in urls:
+                source = self.sources.resolve(url, country)
+                flight = self._flights.get(source.id)
+                if flight is None:
+                    flight = self._flights[source.id] = loop.create_future()
+                    own[source.id] = (country, url, source.dataset)
+                elif progress is not None:
+                    logger.info(f"Joining the fetch of {source.id} already in progress")
+                    progress({'event': 'joined', 'timestamp': requested_at, 'source': source.id})
+                flights.append(flight)
+
+        if own:
+            try:
+                for source_id, result in (await self._fetch_own(own, fetch, requested_at, on_start, progress)).items():
+                    self._flights[source_id].set_result(result)
+            except BaseException as e:
+                for source_id in own:
+                    flight = self._flights[source_id]
+                    if flight.done():
+                        continue
+                    if isinstance(e, asyncio.CancelledError):
+                        flight.cancel()
+                    else:
+                        flight.set_exception(e)
+                        # Joined requests still get the error when they await it; this marks it
+                        # retrieved so a flight nobody joined is not reported as unhandled
+                        flight.exception()
+                raise
+            finally:
+                for source_id in own:
+                    self._flights.pop(source_id, None)
+        elif on_start is not None:
+            on_start()
+
+        return _merge(await asyncio.gather(*flights))
+
+    async def _fetch_own(self, own, fetch, requested_at, on_start, progress) -> Dict[str, Dict]:
+        async with self._lock:
+            if on_start is not None:
+                on_start()
+            with ExitStack() as locks:
+                # Always locked in the same order, so processes cannot deadlock
+                for source_id in sorted(own):
+                    await asyncio.to_thread(locks.enter_context, file_lock(self._path(source_id) + '.flight'))
+
+                source_results, to_fetch = {}, {}
+                for source_id, (country, url, _) in own.items():
+                    try:
+                        last = read_json(self._path(source_id))
+                    except Exception:
+                        last = None
+                    if last and last['finished_at'] >= requested_at:
+                        logger.info(f"{source_id} was fetched by process {last['pid']} meanwhile, reusing its result")
+                        source_results[source_id] = last['result']
+                        if progress is not None:
+                            progress({'event': 'reused', 'timestamp': datetime.now().isoformat(), 'source': source_id})
+                    else:
+                        to_fetch.setdefault(country, []).append(url)
+
+                if to_fetch:
+                    results, _, files_downloaded = await fetch(to_fetch)
+                    finished_at = datetime.now().isoformat()
+                    for source_id, (country, url, dataset) in own.items():
+                        if source_id in source_results:
+                            continue
+                        source_results[source_id] = _source_result(country, url, dataset, results, files_downloaded)
+                        write_json(self._path(source_id), {'finished_at': finished_at, 'pid': os.getpid(),
+                                                           'result': source_results[source_id]})
+                return source_results
@@ -0,0 +1,174 @@
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.statefile import read_json, write_json
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+# Rows per Parquet row group; readers can decode one group without the rest of the file
+ROW_GROUP_SIZE = 64 * 1024
+
+
+def _to_arrow_table(df: pd.DataFrame) -> pa.Table:
+    """Convert a DataFrame to an Arrow table, stringifying mixed-type columns."""
+    df = df.rename(columns=str)
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Spreadsheet columns often mix numbers and text; store those as strings
+        df = df.copy()
+        for col in df.columns:
+            if df[col].dtype == object:
+                df[col] = df[col].astype(str).where(df[col].notna(), None)
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+class SnapshotStore:
+    """Versioned Parquet snapshots of downloaded datasets, one manifest per dataset."""
+
+    def __init__(self, snapshot_dir: str, keep_last: Optional[int] = None, max_age_days: Optional[int] = None):
+        self.snapshot_dir = snapshot_dir
+        self.keep_last = keep_last
+        self.max_age_days = max_age_days
+        os.makedirs(snapshot_dir, exist_ok=True)
+
+    def _dataset_dir(self, name: str) -> str:
+        return os.path.join(self.snapshot_dir, name)
+
+    def manifest(self, name: str) -> Dict:
+        """Load the manifest of a dataset."""
+        path = os.path.join(self._dataset_dir(name), MANIFEST_FILE)
+        try:
+            manifest = read_json(path)
+            if manifest is not None:
+                return manifest
+        except Exception as e:
+            logger.warning(f"Could not read snapshot manifest for {name}: {str(e)}")
+        return {'dataset': name, 'versions': []}
+
+    def _save_manifest(self, name: str, manifest: Dict):
+        write_json(os.path.join(self._dataset_dir(name), MANIFEST_FILE), manifest)
+
+    def versions(self, name: str) -> List[Dict]:
+        """Return the versions of a dataset, oldest first."""
+        return self.manifest(name)['versions']
+
+    def latest(self, name: str) -> Optional[Dict]:
+        """Return the newest version of a dataset, or None if there is none."""
+        versions = self.versions(name)
+        return versions[-1] if versions else None
+
+    def path(self, name: str, version: Optional[str] = None) -> Optional[str]:
+        """Return the Parquet path of a version (the latest by default)."""
+        versions = self.versions(name)
+        if version is not None:
+            versions = [v for v in versions if v['version'] == version]
+        if not versions:
+            return None
+        return os.path.join(self._dataset_dir(name), versions[-1]['file'])
+
+    def write(self, name: str, df: pd.DataFrame, digest: Optional[str] = None) -> Dict:
+        """Write a new version of a dataset and apply the retention policy."""
+        os.makedirs(self._dataset_dir(name), exist_ok=True)
+        now = datetime.now()
+        version = now.strftime('%Y%m%dT%H%M%S%f')
+        file = f"{version}.parquet"
+
+        table = _to_arrow_table(df)
+        pq.write_table(table, os.path.join(self._dataset_dir(name), file), compression='zstd',
+                       row_group_size=ROW_GROUP_SIZE)
+
+        entry = {
+            'version': version,
+            'file': file,
+            'created_at': now.isoformat(),
+            'rows': table.num_rows,
+            'columns': table.column_names,
+            'digest': digest,
+            'size': os.path.getsize(os.path.join(self._dataset_dir(name), file))
+        }
+        manifest = self.manifest(name)
+        manifest['versions'].append(entry)
+        self._save_manifest(name, manifest)
+        logger.info(f"Wrote snapshot {version} of {name} ({table.num_rows} rows)")
+
+        self.compact(name)
+        self.apply_retention(name)
+        return entry
+
+    def read_table(self, name: str, columns: Optional[List[str]] = None, version: Optional[str] = None) -> Optional[pa.Table]:
+        """Read a version as an Arrow table, memory-mapped and projected to ``columns``."""
+        path = self.path(name, version)
+        if path is None or not os.path.exists(path):
+            return None
+        return pq.read_table(path, columns=columns, memory_map=True)
+
+    def read(self, name: str, columns: Optional[List[str]] = None, version: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """Read a version as a DataFrame, memory-mapped and projected to ``columns``."""
+        table = self.read_table(name, columns, version)
+        return table.to_pandas() if table is not None else None
+
+    def apply_retention(self, name: str) -> List[str]:
+        """Drop versions beyond ``keep_last`` or older than ``max_age_days``.
+
+        The newest version is always kept. Returns the removed versions.
+        """
+        manifest = self.manifest(name)
+        versions = manifest['versions']
+        if len(versions) <= 1:
+            return []
+
+        keep = versions[:]
+        if self.max_age_days is not None:
+            cutoff = (datetime.now() - timedelta(days=self.max_age_days)).isoformat()
+            keep = [v for v in keep[:-1] if v['created_at'] >= cutoff] + keep[-1:]
+        if self.keep_last is not None:
+            keep = keep[-max(self.keep_last, 1):]
+
+        removed = [v for v in versions if v not in keep]
+        for v in removed:
+            path = os.path.join(self._dataset_dir(name), v['file'])
+            if os.path.exists(path):
+                os.remove(path)
+        if removed:
+            manifest['versions'] = keep
+            self._save_manifest(name, manifest)
+            logger.info(f"Removed {len(removed)} old snapshots of {name}")
+        return [v['version'] for v in removed]
+
+    def compact(self, name: str) -> List[str]:
+        """Drop consecutive versions with identical content and orphaned Parquet files.
+
+        Runs with the retention pass after each write. Parquet files newer than
+        the latest version are left alone, since another writer may not have
+        added them to the manifest yet. Returns the removed versions.
+        """
+        manifest = self.manifest(name)
+        keep, removed = [], []
+        for v in manifest['versions']:
+            if keep and v.get('digest') and v.get('digest') == keep[-1].get('digest'):
+                removed.append(v)
+            else:
+                keep.append(v)
+
+        dataset_dir = self._dataset_dir(name)
+        kept_files = {v['file'] for v in keep}
+        latest_file = keep[-1]['file'] if keep else None
+        if os.path.isdir(dataset_dir) and latest_file is not None:
+            for file in os.listdir(dataset_dir):
+                # Version names sort by time, so later files are still being written
+                if file.endswith('.parquet') and file not in kept_files and file < latest_file:
+                    os.remove(os.path.join(dataset_dir, file))
+
+        if removed:
+            manifest['versions'] = keep
+            self._save_manifest(name, manifest)
+            logger.info(f"Compacted {len(removed)} duplicate snapshots of {name}")
+        return [v['version'] for v in removed]
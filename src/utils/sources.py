@@ -0,0 +1,82 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+from config.settings import DATA_SOURCES
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class DataSource:
+    """One provider page and the dataset downloaded from it (see DATA_SOURCES)."""
+    id: str
+    country: str
+    url: str
+    dataset: str
+    label: str = ''
+    link_rules: Dict = field(default_factory=dict)
+    ingestion: Dict = field(default_factory=dict)
+    schedule: Optional[Dict] = None
+
+    @classmethod
+    def derived(cls, url: str, country: str) -> 'DataSource':
+        """Describe a page URL that is not in the registry, naming it after its path."""
+        path_parts = urlparse(url).path.split('/')
+        relevant_part = next((part for part in path_parts if 'hospital' in part), path_parts[-1])
+        return cls(id=f"{country}_{url.split('/')[-1]}", country=country, url=url,
+                   dataset=f"{country}_{relevant_part.replace('-', '_').title()}",
+                   label=relevant_part.replace('-', ' ').title())
+
+
+class SourceRegistry:
+    """Configured data sources, indexed by id, page URL and dataset name."""
+
+    def __init__(self, sources: List[Dict]):
+        self._by_id = {}
+        self._by_url = {}
+        self._by_dataset = {}
+        for entry in sources:
+            source = entry if isinstance(entry, DataSource) else DataSource(**entry)
+            if source.id in self._by_id:
+                raise ValueError(f"Duplicate data source id: {source.id}")
+            self._by_id[source.id] = source
+            self._by_url[source.url] = source
+            self._by_dataset.setdefault(source.dataset, source)
+
+    def __iter__(self) -> Iterator[DataSource]:
+        return iter(self._by_id.values())
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def get(self, source_id: str) -> Optional[DataSource]:
+        return self._by_id.get(source_id)
+
+    def by_url(self, url: str) -> Optional[DataSource]:
+        return self._by_url.get(url)
+
+    def by_dataset(self, dataset: str) -> Optional[DataSource]:
+        return self._by_dataset.get(dataset)
+
+    def resolve(self, url: str, country: Optional[str] = None) -> DataSource:
+        """Return the source of a page URL, deriving one for URLs not in the registry."""
+        source = self._by_url.get(url)
+        if source is None:
+            logger.debug(f"No data source configured for {url}, deriving one from the URL")
+            source = DataSource.derived(url, country or '')
+        return source
+
+    def urls(self) -> Dict[str, List[str]]:
+        """Return {country: [page URLs]}, the shape LinkFetcher takes."""
+        return {country: [source.url for source in sources] for country, sources in self.by_country().items()}
+
+    def by_country(self) -> Dict[str, List[DataSource]]:
+        grouped = {}
+        for source in self:
+            grouped.setdefault(source.country, []).append(source)
+        return grouped
+
+
+SOURCES = SourceRegistry(DATA_SOURCES)
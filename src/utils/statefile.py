@@ -0,0 +1,124 @@
+import copy
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:  # Everywhere else
+    msvcrt = None
+
+logger = logging.getLogger(__name__)
+
+LOCK_SUFFIX = '.lock'
+
+# Parsed JSON per path, with the stat signature of the file it was read from
+_read_cache = {}
+_read_cache_lock = threading.Lock()
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive advisory lock for ``path`` (on a ``<path>.lock`` sidecar).
+
+    Serializes writers across threads and processes. Readers do not need it,
+    since files are only ever replaced whole.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + LOCK_SUFFIX, 'a+') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _signature(stat: os.stat_result):
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def read_json(path: str, default: Any = None) -> Any:
+    """Load a JSON file, or return ``default`` if it does not exist.
+
+    Parsed contents are cached until the file changes on disk, and each call
+    returns its own copy. Raises on unreadable or invalid files like json.load.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return default
+    with _read_cache_lock:
+        cached = _read_cache.get(path)
+    if cached is None or cached[0] != _signature(stat):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        with _read_cache_lock:
+            _read_cache[path] = (_signature(stat), data)
+    else:
+        data = cached[1]
+    return copy.deepcopy(data)
+
+
+def _write(path: str, data: Any, indent):
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=indent, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    with _read_cache_lock:
+        _read_cache[path] = (_signature(os.stat(path)), copy.deepcopy(data))
+
+
+def write_json(path: str, data: Any, indent=4):
+    """Replace a JSON file atomically: readers see the old or the new contents, never a partial write."""
+    with file_lock(path):
+        _write(path, data, indent)
+
+
+def update_json(path: str, update: Callable[[Any], Any], default: Any = None, indent=4) -> Any:
+    """Read, modify and write a JSON file under its lock, so concurrent updates are not lost.
+
+    ``update`` receives the current contents (or ``default``) and returns the
+    new contents, which are written and returned.
+    """
+    with file_lock(path):
+        try:
+            current = read_json(path, default)
+        except ValueError as e:
+            logger.warning(f"Replacing unreadable state file {path}: {str(e)}")
+            current = copy.deepcopy(default)
+        data = update(current)
+        _write(path, data, indent)
+    return data
@@ -0,0 +1,170 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from config.settings import DATASET_VIEWER
+from utils.ingest import read_source_file
+from utils.manifest import load_manifest
+from utils.schema import SchemaRegistry
+from utils.snapshots import SnapshotStore, _to_arrow_table
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.path.join('src', 'data', 'snapshots')
+SCHEMA_FILE = os.path.join('src', 'data', 'config', 'schemas.json')
+
+
+def _plain(values: pa.ChunkedArray) -> pa.Array:
+    """Combine a column into one array, decoding dictionary (categorical) columns."""
+    if pa.types.is_dictionary(values.type):
+        values = values.cast(values.type.value_type)
+    return values.combine_chunks()
+
+
+class DatasetView:
+    """Read-only, paged access to one dataset.
+
+    Only the columns and rows of the requested page are read. Filtering and
+    sorting read just the filtered and sorted columns to work out the row
+    order, which is kept for the next pages. Backed by a memory-mapped Parquet
+    snapshot (read one row group at a time) or by an in-memory Arrow table.
+    """
+
+    def __init__(self, path: Optional[str] = None, table: Optional[pa.Table] = None,
+                 max_orderings: int = DATASET_VIEWER['CACHED_ORDERINGS']):
+        if (path is None) == (table is None):
+            raise ValueError("DatasetView needs either a Parquet path or a table")
+        self.path = path
+        self.table = table
+        if path is not None:
+            metadata = pq.read_metadata(path)
+            self.columns = metadata.schema.to_arrow_schema().names
+            self.num_rows = metadata.num_rows
+            # First row of each row group, and the total at the end
+            self._offsets = np.cumsum([0] + [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)])
+        else:
+            self.columns = table.column_names
+            self.num_rows = table.num_rows
+        self.max_orderings = max_orderings
+        self._orderings = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def source(self) -> str:
+        return 'snapshot' if self.path is not None else 'file'
+
+    def _read_columns(self, columns: List[str]) -> pa.Table:
+        if self.table is not None:
+            return self.table.select(columns)
+        with pq.ParquetFile(self.path, memory_map=True) as parquet_file:
+            return parquet_file.read(columns=columns)
+
+    def _take(self, positions: np.ndarray, columns: List[str]) -> pa.Table:
+        """Read the rows at ``positions``, decoding only the row groups they fall in."""
+        if self.table is not None:
+            return self.table.select(columns).take(pa.array(positions, type=pa.int64()))
+        groups = np.searchsorted(self._offsets, positions, side='right') - 1
+        needed = np.unique(groups)
+        with pq.ParquetFile(self.path, memory_map=True) as parquet_file:
+            table = parquet_file.read_row_groups(needed.tolist(), columns=columns)
+        # Where each needed group starts in the table just read
+        starts = np.cumsum([0] + [self._offsets[g + 1] - self._offsets[g] for g in needed[:-1]])
+        local = positions - self._offsets[groups] + starts[np.searchsorted(needed, groups)]
+        return table.take(pa.array(local, type=pa.int64()))
+
+    def ordering(self, filter_column: Optional[str] = None, filter_text: Optional[str] = None,
+                 sort_by: Optional[str] = None, descending: bool = False) -> Optional[np.ndarray]:
+        """Return the positions of the rows matching the filter, in sort order.
+
+        The filter keeps rows whose ``filter_column`` contains ``filter_text``,
+        ignoring case. Returns None when there is nothing to filter or sort,
+        meaning all rows in file order.
+        """
+        if not filter_column or not filter_text:
+            filter_column = filter_text = None
+        if filter_column is None and sort_by is None:
+            return None
+
+        key = (filter_column, filter_text, sort_by, descending)
+        with self._lock:
+            if key in self._orderings:
+                self._orderings.move_to_end(key)
+                return self._orderings[key]
+
+        columns = list(dict.fromkeys(column for column in (filter_column, sort_by) if column))
+        table = self._read_columns(columns)
+        positions = np.arange(self.num_rows)
+        if filter_column is not None:
+            text = _plain(table.column(filter_column)).cast(pa.string())
+            matches = pc.fill_null(pc.match_substring(text, filter_text, ignore_case=True), False)
+            positions = pc.indices_nonzero(matches).to_numpy().astype(np.int64)
+        if sort_by is not None:
+            values = _plain(table.column(sort_by)).take(pa.array(positions, type=pa.int64()))
+            order = pc.array_sort_indices(values, order='descending' if descending else 'ascending',
+                                          null_placement='at_end')
+            positions = positions[order.to_numpy()]
+
+        with self._lock:
+            self._orderings[key] = positions
+            while len(self._orderings) > self.max_orderings:
+                self._orderings.popitem(last=False)
+        return positions
+
+    def page(self, page: int, page_size: int, columns: Optional[List[str]] = None,
+             filter_column: Optional[str] = None, filter_text: Optional[str] = None,
+             sort_by: Optional[str] = None, descending: bool = False) -> Tuple[pd.DataFrame, int]:
+        """Return one page of rows (0-based page number) and the number of matching rows.
+
+        The DataFrame is indexed by each row's position in the dataset.
+        """
+        columns = [column for column in (columns or self.columns) if column in self.columns]
+        order = self.ordering(filter_column, filter_text, sort_by, descending)
+        total = self.num_rows if order is None else len(order)
+        start = min(max(page, 0) * page_size, total)
+        stop = min(start + page_size, total)
+        positions = np.arange(start, stop) if order is None else order[start:stop]
+        if not len(positions) or not columns:
+            return pd.DataFrame(columns=columns), total
+
+        df = self._take(positions, columns).to_pandas()
+        df.index = positions
+        return df, total
+
+    def value_counts(self, column: str) -> Dict:
+        """Count the rows per value of a column, reading only that column."""
+        counts = pc.value_counts(_plain(self._read_columns([column]).column(column)))
+        return dict(zip(counts.field('values').to_pylist(), counts.field('counts').to_pylist()))
+
+
+def open_view(file_path: str, snapshot_dir: str = SNAPSHOT_DIR, schema_file: str = SCHEMA_FILE) -> Optional[DatasetView]:
+    """Open a downloaded file for viewing.
+
+    Uses the dataset's latest Parquet snapshot when it holds the same data
+    as the file, so nothing is parsed. Otherwise the file is parsed once, with
+    its registered dtypes, into an Arrow table. Returns None for unsupported files.
+    """
+    dataset_name = os.path.splitext(os.path.basename(file_path))[0]
+    snapshot_store = SnapshotStore(snapshot_dir)
+    snapshot = snapshot_store.latest(dataset_name)
+    manifest = load_manifest(file_path)
+    if snapshot is not None and manifest is not None and snapshot.get('digest') == manifest.get('digest'):
+        path = snapshot_store.path(dataset_name, snapshot['version'])
+        if os.path.exists(path):
+            return DatasetView(path=path)
+
+    logger.info(f"No current snapshot of {dataset_name}, parsing {os.path.basename(file_path)}")
+    if file_path.endswith('.csv'):
+        df = SchemaRegistry(schema_file).read_csv(file_path, dataset_name)
+    elif file_path.endswith(('.xlsx', '.xls')):
+        df = read_source_file(file_path, dataset_name)
+    else:
+        return None
+    return DatasetView(table=_to_arrow_table(df))
@@ -0,0 +1,197 @@
+"""Ingestion worker processes.
+
+Parsing, comparing and saving downloaded files is CPU-bound, so LinkFetcher
+hands it to a pool of worker processes and keeps its event loop free for
+network I/O. Workers only write each dataset's own files (CSV, manifest,
+changelog and snapshots); the schema registry is updated by the fetching
+process from the results they return.
+
+Workers are spawned, not forked, so scripts that use LinkFetcher must guard
+their entry point with ``if __name__ == "__main__":``.
+"""
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from config.settings import DATASET_KEY_COLUMNS, SNAPSHOT_RETENTION
+from utils.changelog import ChangeLog, diff_rows
+from utils.ingest import read_source_file
+from utils.instrumentation import RunTrace, timed
+from utils.manifest import compute_digest, load_manifest, save_manifest
+from utils.normalize import compare_frames
+from utils.schema import SchemaRegistry
+from utils.snapshots import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IngestJob:
+    """A downloaded file waiting to be parsed and saved."""
+    temp_path: str
+    file_name: str
+    download_dir: str
+
+
+@dataclass
+class IngestResult:
+    """Outcome of an IngestJob, returned to the fetching process."""
+    file_name: str
+    saved: bool = False
+    changes: Optional[Dict[str, int]] = None  # Row-level change summary, if a previous version existed
+    drift: Optional[Dict] = None  # Schema drift against the registered schema
+    schema: Optional[Dict] = None  # Schema of the version now on disk, to register
+    spans: List[Dict] = field(default_factory=list)  # Stage timings for the run trace
+    error: Optional[str] = None
+
+
+class DatasetProcessor:
+    """Parses downloaded files and saves each dataset if its data changed."""
+
+    def __init__(self, download_dir: str):
+        data_dir = os.path.dirname(download_dir)
+        self.download_dir = download_dir
+        self.schema_file = os.path.join(data_dir, 'config', 'schemas.json')
+        self.changelog = ChangeLog(os.path.join(data_dir, 'changelog'))
+        self.snapshots = SnapshotStore(
+            os.path.join(data_dir, 'snapshots'),
+            keep_last=SNAPSHOT_RETENTION["KEEP_LAST"],
+            max_age_days=SNAPSHOT_RETENTION["MAX_AGE_DAYS"]
+        )
+        self.schemas = SchemaRegistry(self.schema_file)
+        self.trace = RunTrace()
+
+    def process(self, job: IngestJob) -> IngestResult:
+        """Parse a downloaded file and save its data if it changed."""
+        file_name = job.file_name
+        result = IngestResult(file_name)
+        self.trace = RunTrace()
+        # The registry is updated by the fetching process, so reload it for each file
+        self.schemas = SchemaRegistry(self.schema_file)
+
+        try:
+            # Convert to DataFrame, parsing only the sheet and columns the dataset's spec asks for
+            with self.trace.stage('file_parse', file_name, bytes=os.path.getsize(job.temp_path)) as span:
+                df = self.schemas.apply(file_name, read_source_file(job.temp_path, file_name))
+                span['rows'] = len(df)
+
+            # Flag columns that appeared, disappeared or changed type since the saved version
+            drift = self.schemas.check(file_name, df)
+            if drift:
+                logger.warning(f"Schema drift in {file_name}: {drift.describe()}")
+                result.drift = drift.to_dict()
+
+            # Save file with comparison
+            result.saved = self._save_file(df, file_name, result)
+            result.schema = SchemaRegistry.describe(df)
+        except Exception as e:
+            logger.error(f"Error processing {file_name}: {str(e)}")
+            result.error = str(e)
+
+        result.spans = self.trace.spans
+        return result
+
+    @timed('compare')
+    def _compare_data(self, new_df, existing_file, file_name):
+        """Compare new data with existing data."""
+        if not os.path.exists(existing_file):
+            logger.info(f"No existing file found at {existing_file}, will save new data.")
+            return False  # No existing file, save new data
+            
+        try:
+            # Load existing data with its registered dtypes, so both sides are typed alike
+            existing_df = self.schemas.read_csv(existing_file, file_name)
+            
+            # Debug info
+            logger.debug(f"Existing data shape: {existing_df.shape}, New data shape: {new_df.shape}")
+            
+            # Vectorized comparison, ignoring column names and index
+            result = compare_frames(existing_df, new_df)
+            if result.shape_changed:
+                logger.info(f"Shape mismatch: Existing {result.old_shape}, New {result.new_shape}")
+            elif not result.equal:
+                logger.info(f"{result.cell_diff_count} cells differ")
+                for i in result.diff_rows:
+                    logger.debug(f"Difference in row {i}:")
+                    logger.debug(f"  Existing: {existing_df.iloc[i].tolist()}")
+                    logger.debug(f"  New:      {new_df.iloc[i].tolist()}")
+            
+            logger.info(f"Final comparison result: {'EQUAL' if result.equal else 'DIFFERENT'}")
+            return result.equal
+            
+        except Exception as e:
+            logger.warning(f"Error comparing data: {str(e)}")
+            import traceback
+            logger.warning(traceback.format_exc())
+            return False
+
+    def _save_file(self, df, file_name, result):
+        """Save DataFrame to file with comparison."""
+        file_path = os.path.join(self.download_dir, f"{file_name}.csv")
+        
+        # Fast path: compare content digests without re-reading the existing file
+        with self.trace.stage('digest', file_name, rows=len(df)):
+            digest = compute_digest(df)
+            manifest = load_manifest(file_path)
+        if manifest and manifest.get('digest') == digest and os.path.exists(file_path):
+            logger.info(f"Data unchanged for {file_name} (digest match) - skipping save")
+            return False
+        
+        # Digest differs or is unknown, fall back to a full comparison
+        is_same = self._compare_data(df, file_path, file_name)
+        if is_same:
+            logger.info(f"Data unchanged for {file_name} - skipping save")
+            # Record the digest so the next check can take the fast path
+            save_manifest(file_path, df, digest)
+            return False
+        
+        # Record row-level deltas against the previous version
+        if os.path.exists(file_path):
+            self._record_changes(df, file_path, file_name, result)
+        
+        # Save new data
+        with self.trace.stage('csv_write', file_name, rows=len(df)) as span:
+            df.to_csv(file_path, index=False)
+            save_manifest(file_path, df, digest)
+            span['bytes'] = os.path.getsize(file_path)
+        logger.info(f"Saved new data to {file_name}")
+        
+        # Keep a versioned columnar copy for history and fast reads
+        try:
+            with self.trace.stage('snapshot_write', file_name, rows=len(df)):
+                self.snapshots.write(file_name, df, digest)
+        except Exception as e:
+            logger.warning(f"Error writing snapshot for {file_name}: {str(e)}")
+        return True
+
+    @timed('changelog')
+    def _record_changes(self, new_df, existing_file, file_name, result):
+        """Append the added, removed and modified rows of a new version to the changelog."""
+        try:
+            diff = diff_rows(self.schemas.read_csv(existing_file, file_name), new_df, DATASET_KEY_COLUMNS.get(file_name))
+            self.changelog.append(file_name, diff)
+            result.changes = diff.summary()
+        except Exception as e:
+            logger.warning(f"Error recording changes for {file_name}: {str(e)}")
+
+
+# One processor per download directory in each worker process
+_processors: Dict[str, DatasetProcessor] = {}
+
+
+def init_worker(log_file: str):
+    """Send a worker's log records to the fetcher log."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.FileHandler(log_file)]
+    )
+
+
+def ingest_file(job: IngestJob) -> IngestResult:
+    """Process one IngestJob (the function submitted to the worker pool)."""
+    processor = _processors.get(job.download_dir)
+    if processor is None:
+        processor = _processors[job.download_dir] = DatasetProcessor(job.download_dir)
+    return processor.process(job)